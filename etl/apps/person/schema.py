@@ -12,6 +12,12 @@ SCHEMA = {
             'full_name': {
                 'type': 'text',
                 'analyzer': 'ru_en',
+                'fields': {
+                    'suggest': {
+                        'type': 'completion',
+                        'analyzer': 'simple'
+                    }
+                }
             },
             'roles': {
                 'type': 'keyword'
@@ -68,12 +68,29 @@ class ElasticsearchSettings(BaseSettings):
         env_file = '.env'
 
 
+class RedisSettings(BaseSettings):
+    """Параметры настроек для Redis"""
+    REDIS_HOST: str = 'localhost'
+    REDIS_PORT: Optional[int] = 6379
+    REDIS_CHANNEL: str = 'cache:invalidate'
+
+    class Config:
+        env_file = '.env'
+
+
 class ETLSettings(BaseSettings):
     """Параметры настроек для ETL"""
     LIMIT: Optional[int] = 100
     UPLOAD_INTERVAL: float
     STATE_FIELD: str
     STATE_FILE_NAME: str
+    # С какого объема загрузки сбрасывать кэш API сменой поколения ключей
+    # вместо поштучного сброса по тегам
+    GENERATION_BUMP_THRESHOLD: int = 1000
+    # Доля ложных срабатываний фильтра Блума идентификаторов
+    # и запас емкости фильтра на документы, созданные до перестроения
+    BLOOM_ERROR_RATE: float = 0.01
+    BLOOM_HEADROOM: float = 1.5
     INSTALLED_APPS: List[str] = [
         'film',
         'genre',
@@ -86,4 +103,5 @@ class ETLSettings(BaseSettings):
 
 pg_settings = PostgresSettings()
 es_settings = ElasticsearchSettings()
+redis_settings = RedisSettings()
 etl_settings = ETLSettings()
@@ -1,4 +1,5 @@
 import logging
+from typing import Iterator
 
 from elasticsearch import Elasticsearch, helpers
 from utils.decorators import backoff
@@ -8,6 +9,17 @@ es_log = logging.getLogger('elasticsearch')
 es_log.setLevel(logging.CRITICAL)
 
 
+class TransferError(helpers.BulkIndexError):
+    """
+    Часть пакета не загружена. changed - идентификаторы документов,
+    которые загрузить удалось
+    """
+
+    def __init__(self, message, errors, changed):
+        super().__init__(message, errors)
+        self.changed = changed
+
+
 class ElasticsearchDatabase:
     def __init__(self, settings=None):
         self.host = settings.ES_HOST
@@ -16,6 +28,8 @@ class ElasticsearchDatabase:
         self.status = True if self.__get_status_connect() else False
         self.index = None
         self.schema = None
+        # Индексы, созданные заново за время работы
+        self.created_indices: set = set()
 
     @backoff(exception=ConnectionError)
     def __get_status_connect(self):
@@ -39,23 +53,56 @@ class ElasticsearchDatabase:
     def create_index(self, index: str):
         if body := self.schema:
             self.client.indices.create(index=index, body=body)
+            self.created_indices.add(index)
             logger.info(f"Index '{index}' created")
         else:
             logger.warning(
                 "Index '%s' not created, missing schema", index)
 
     @backoff(exception=ConnectionError)
-    def transfer_data(self, actions) -> None:
-        """Добавляет пакеты данных в Elasticsearch"""
+    def count(self, index: str) -> int:
+        # Только что загруженные документы тоже должны быть учтены
+        self.client.indices.refresh(index=index)
+        return self.client.count(index=index)['count']
+
+    def get_ids(self, index: str) -> Iterator[str]:
+        """Идентификаторы всех документов индекса"""
+        for hit in helpers.scan(self.client, index=index, _source=False,
+                                query={'query': {'match_all': {}}}):
+            yield hit['_id']
+
+    @backoff(exception=ConnectionError)
+    def transfer_data(self, actions) -> dict:
+        """
+        Добавляет пакеты данных в Elasticsearch, возвращает идентификаторы
+        успешно загруженных документов: обновленных и созданных.
+        Если часть документов не загружена, вызывает TransferError
+        """
         logger.info('Get index %s ...', self.index)
         self.get_indices()
-        success, failed = helpers.bulk(
+        changed: dict = {'ids': [], 'created': []}
+        errors: list = []
+        for ok, item in helpers.streaming_bulk(
             client=self.client,
             actions=[
                 {'_index': self.index, '_id': action.get('id'), **action}
                 for action in actions
             ],
-            stats_only=True
-        )
+            raise_on_error=False,
+            # Об изменениях сообщается сразу после загрузки пакета,
+            # к этому моменту документы должны быть видны в поиске
+            refresh='wait_for',
+        ):
+            if not ok:
+                errors.append(item)
+            elif item['index'].get('result') == 'created':
+                changed['created'].append(item['index']['_id'])
+            else:
+                changed['ids'].append(item['index']['_id'])
         logger.info('Transfer data to %s: success: %s, failed: %s',
-                    self.index, success, failed)
+                    self.index,
+                    len(changed['ids']) + len(changed['created']), len(errors))
+        if errors:
+            raise TransferError(
+                f'{len(errors)} document(s) failed to index', errors, changed)
+        return changed
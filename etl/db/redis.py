@@ -0,0 +1,99 @@
+import json
+import logging
+from typing import Optional
+
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from utils.decorators import backoff
+
+logger = logging.getLogger(__name__)
+
+
+class RedisPublisher:
+    """Публикует идентификаторы измененных документов для сброса кэша API"""
+
+    def __init__(self, settings=None):
+        self.host = settings.REDIS_HOST
+        self.port = settings.REDIS_PORT
+        self.channel = settings.REDIS_CHANNEL
+        self.client = Redis(host=self.host, port=self.port)
+        self.status = True if self.__get_status_connect() else False
+
+    @backoff(exception=ConnectionError)
+    def __get_status_connect(self):
+        logger.info('Connecting to Redis ...')
+        try:
+            self.client.ping()
+        except RedisConnectionError as error:
+            raise ConnectionError('No connection to Redis') from error
+        logger.info('Connected to Redis completed')
+        return True
+
+    @backoff(exception=RedisConnectionError)
+    def publish(self, index: str, ids: list, created: list = None) -> None:
+        """
+        Сообщает API об измененных документах индекса и меняет ревизию
+        индекса: она входит в ключи списков, поисков и числа документов,
+        в которые документы могли войти или из которых могли выйти.
+        Созданные документы передаются отдельно, их добавляют в фильтр Блума
+        """
+        created = created or []
+        if not ids and not created:
+            return
+        revision = self.client.incr(f'revision:{index}')
+        message = json.dumps({'index': index, 'ids': ids, 'created': created,
+                              'revision': revision})
+        self.client.publish(self.channel, message)
+        logger.info('Published %d updated and %d created ids of %s',
+                    len(ids), len(created), index)
+
+    @backoff(exception=RedisConnectionError)
+    def bump_generation(self, index: str) -> int:
+        """
+        Переключает API на новое поколение ключей кэша индекса,
+        записи прошлого поколения истекают сами
+        """
+        generation = self.client.incr(f'generation:{index}')
+        message = json.dumps({'index': index, 'generation': generation})
+        self.client.publish(self.channel, message)
+        logger.info('Cache generation of %s bumped to %d', index, generation)
+        return generation
+
+    @backoff(exception=RedisConnectionError)
+    def get_bloom(self, index: str) -> Optional[bytes]:
+        return self.client.get(f'bloom:{index}')
+
+    @backoff(exception=RedisConnectionError)
+    def store_bloom(self, index: str, data: bytes) -> None:
+        """
+        Сохраняет фильтр Блума без сообщения: процессы API дополнят
+        свои фильтры из сообщения о созданных документах, а новые
+        прочитают сохраненный
+        """
+        self.client.set(f'bloom:{index}', data)
+
+    @backoff(exception=RedisConnectionError)
+    def publish_bloom(self, index: str, data: bytes) -> None:
+        """Сохраняет фильтр Блума идентификаторов индекса для API"""
+        self.store_bloom(index, data)
+        message = json.dumps({'index': index, 'bloom': True})
+        self.client.publish(self.channel, message)
+        logger.info('Bloom filter of %s published, %d bytes',
+                    index, len(data))
+
+    @backoff(exception=RedisConnectionError)
+    def drop_bloom(self, index: str) -> None:
+        """Удаляет фильтр Блума: API перестает отклонять идентификаторы"""
+        if self.client.delete(f'bloom:{index}'):
+            message = json.dumps({'index': index, 'bloom': True})
+            self.client.publish(self.channel, message)
+            logger.info('Bloom filter of %s dropped', index)
+
+    @backoff(exception=RedisConnectionError)
+    def request_warming(self) -> None:
+        """Просит API прогреть кэш после цикла загрузки"""
+        self.client.publish(self.channel, json.dumps({'warm': True}))
+
+    def close(self):
+        self.client.close()
+        logger.info('Redis connection closed')
@@ -20,8 +20,12 @@ def main():
         with ETL(conf=conf) as etl:
 
             for registered_app in etl.registered_apps:
-                app = registered_app(state=etl.state, es_client=etl.es_client)
+                app = registered_app(state=etl.state,
+                                     es_client=etl.es_client,
+                                     publisher=etl.publisher)
                 app.run()
+            # Уже прогретые записи API только прочитает из кэша
+            etl.publisher.request_warming()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,9 @@
 from datetime import datetime
 from importlib import import_module
 
+from config.settings import etl_settings
+from db.elastic import TransferError
+from utils.bloom import BloomFilter
 from utils.decorators import coroutine
 from utils.utils import camel_to_snake
 
@@ -10,9 +13,10 @@ class BaseApps(object):
     def get_classname(cls):
         return camel_to_snake(cls.__name__)
 
-    def __init__(self, state, es_client, *args, **kwargs):
+    def __init__(self, state, es_client, publisher=None, *args, **kwargs):
         self.apps_name = self.get_classname()
         self.es_client = es_client
+        self.publisher = publisher
         self.state = state
         self.states = self.state.get_state(self.apps_name) or {}
         self.last_modified = self._get_last_modified()
@@ -59,6 +63,75 @@ class BaseApps(object):
     def save_state(self):
         self.state.set_state(self.apps_name, self.states)
 
+    def publish(self, index, changed):
+        """Сообщает API об измененных документах для сброса кэша"""
+        if self.publisher is not None:
+            self.publisher.publish(index, **changed)
+
+    def bump_generation(self, index):
+        """Сбрасывает весь кэш индекса в API сменой поколения ключей"""
+        if self.publisher is not None:
+            self.publisher.bump_generation(index)
+
+    def rebuild_bloom(self, target_db, index):
+        """
+        Строит заново фильтр Блума идентификаторов индекса,
+        по которому API отклоняет запросы несуществующих документов
+        """
+        if self.publisher is None:
+            return
+        capacity = int(target_db.count(index) * etl_settings.BLOOM_HEADROOM)
+        bloom = BloomFilter.create(capacity, etl_settings.BLOOM_ERROR_RATE)
+        for id in target_db.get_ids(index):
+            bloom.add(id)
+        self.publisher.publish_bloom(index, bloom.dumps())
+
+    def update_bloom(self, target_db, index, created):
+        """
+        Добавляет созданные документы в сохраненный фильтр Блума
+        до сообщения о них: процесс API, прочитавший фильтр в любой
+        момент после сообщения, не отклонит эти документы.
+        Весь индекс читается заново, только если фильтра нет
+        или он заполнен больше расчетной емкости
+        """
+        if self.publisher is None or not created:
+            return
+        if index in target_db.created_indices:
+            # Фильтр прежнего индекса новому не соответствует,
+            # новый строится в конце загрузки, до тех пор API
+            # не отклоняет идентификаторы
+            self.publisher.drop_bloom(index)
+            return
+        try:
+            data = self.publisher.get_bloom(index)
+            bloom = BloomFilter.loads(data) if data else None
+        except ValueError:
+            bloom = None
+        if bloom is not None:
+            for id in created:
+                bloom.add(id)
+            if not bloom.is_full(etl_settings.BLOOM_ERROR_RATE):
+                self.publisher.store_bloom(index, bloom.dumps())
+                return
+        self.rebuild_bloom(target_db, index)
+
+    def transfer(self, target_db, index, actions) -> int:
+        """
+        Загружает пакет и сообщает об изменениях, возвращает их число.
+        Созданные документы попадают в фильтр Блума до сообщения
+        """
+        try:
+            changed = target_db.transfer_data(actions=actions)
+        except TransferError as error:
+            # Загруженные документы уже изменились, а состояние
+            # не сохраняется, и пакет будет загружен заново
+            self.update_bloom(target_db, index, error.changed['created'])
+            self.publish(index, error.changed)
+            raise
+        self.update_bloom(target_db, index, changed['created'])
+        self.publish(index, changed)
+        return len(changed['ids']) + len(changed['created'])
+
     def run(self):
         pass
 
@@ -77,12 +150,23 @@ class BaseApps(object):
         target_db.index = index
         target_db.schema = schema
         actions: list = []
+        transferred = 0
         try:
             while True:
                 data = (yield)
                 actions.append(data)
                 if len(actions) == batch_size:
-                    target_db.transfer_data(actions=actions)
+                    transferred += self.transfer(target_db, index, actions)
                     actions.clear()
         except GeneratorExit:
-            target_db.transfer_data(actions=actions)
+            transferred += self.transfer(target_db, index, actions)
+            # После пересоздания индекса или массовой загрузки
+            # дешевле сменить поколение ключей, чем сбрасывать теги
+            if (index in target_db.created_indices
+                    or transferred >= etl_settings.GENERATION_BUMP_THRESHOLD):
+                self.bump_generation(index)
+            # Фильтр пересозданного индекса строится по всем его
+            # документам. Удаленные документы фильтру не мешают
+            if index in target_db.created_indices:
+                self.rebuild_bloom(target_db, index)
+            target_db.created_indices.discard(index)
@@ -2,10 +2,11 @@ import logging
 from importlib import import_module
 from time import sleep
 
-from config.settings import es_settings, pg_settings
+from config.settings import es_settings, pg_settings, redis_settings
 from db.elastic import ElasticsearchDatabase
 from db.manager import BaseManager
 from db.postgres import PostgresDatabase
+from db.redis import RedisPublisher
 from utils.state import JsonFileStorage, State
 
 logger = logging.getLogger(__name__)
@@ -17,6 +18,7 @@ class ETL:
         self.state = None
         self.pg_client = None
         self.es_client = None
+        self.publisher = None
         self.states = None
         self.registered_apps = self.__register_apps()
 
@@ -30,6 +32,7 @@ class ETL:
         try:
             self.pg_client = PostgresDatabase(settings=pg_settings).connection
             self.es_client = ElasticsearchDatabase(settings=es_settings)
+            self.publisher = RedisPublisher(settings=redis_settings)
             BaseManager.set_connection(conn=self.pg_client)
             BaseManager.set_limit(limit=self.conf.LIMIT)
         except Exception:
@@ -45,6 +48,9 @@ class ETL:
         if self.es_client is not None:
             self.es_client.close()
 
+        if self.publisher is not None:
+            self.publisher.close()
+
         if self.pg_client and not self.pg_client.closed:
             self.pg_client.close()
             logger.info('PostgreSQL connection closed')
@@ -0,0 +1,61 @@
+import math
+import struct
+from typing import Iterator, Optional
+
+import xxhash
+
+# Формат общий с src/db/bloom.py: фильтры читает API
+MAGIC = b'BF1'
+HEADER = struct.Struct('>QB')
+
+
+class BloomFilter:
+    """Фильтр Блума идентификаторов документов индекса"""
+
+    def __init__(self, size: int, hashes: int,
+                 bits: Optional[bytearray] = None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def create(cls, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2),
+                   8)
+        hashes = max(round(size / capacity * math.log(2)), 1)
+        return cls(size, hashes)
+
+    def positions(self, item: str) -> Iterator[int]:
+        # Двойное хеширование: k позиций из двух половин одного хеша
+        digest = xxhash.xxh3_128_intdigest(item)
+        first, second = digest >> 64, digest & 0xFFFFFFFFFFFFFFFF
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(item))
+
+    def error_rate(self) -> float:
+        # Доля ложных срабатываний при текущем заполнении фильтра
+        filled = bin(int.from_bytes(self.bits, 'big')).count('1')
+        return (filled / self.size) ** self.hashes
+
+    def is_full(self, error_rate: float) -> bool:
+        # Документов больше, чем емкость, заданная при создании
+        return self.error_rate() > error_rate
+
+    def dumps(self) -> bytes:
+        return MAGIC + HEADER.pack(self.size, self.hashes) + self.bits
+
+    @classmethod
+    def loads(cls, data: bytes):
+        if not data.startswith(MAGIC):
+            raise ValueError('Not a bloom filter')
+        size, hashes = HEADER.unpack_from(data, len(MAGIC))
+        return cls(size, hashes, bytearray(data[len(MAGIC) + HEADER.size:]))
@@ -19,6 +19,12 @@ class FilmsViewSet(ViewSet):
             'response_description': ('uuid, название, описание, рейтинг, \
                                      актеры, режиссеры, сценаристы'),
         },
+        'retrieve_many': {
+            'summary': 'Несколько фильмов по uuid',
+            'description': 'Подробная информация о фильмах одним запросом',
+            'response_description': ('uuid, название, описание, рейтинг, \
+                                     актеры, режиссеры, сценаристы'),
+        },
         'retrieve_list': {
             'summary': 'Список фильмов',
             'description': ('Список фильмов с пагинацией, \
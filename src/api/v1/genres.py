@@ -1,5 +1,7 @@
+from core.fastapi_viewset.mixins import RelationViewMixin
 from core.fastapi_viewset.router import MainRouter
 from core.fastapi_viewset.viewsets import ReadOnlyViewSet
+from services.films import Films
 from services.genres import Genres
 
 from .utils.genres import Sort
@@ -8,19 +10,37 @@ router = MainRouter()
 
 
 @router.view(tags=['Жанры'])
-class GenresViewSet(ReadOnlyViewSet):
+class GenresViewSet(ReadOnlyViewSet, RelationViewMixin):
     model = Genres
     sort_schema = Sort
+    related_model = Films
     docum_api = {
         'retrieve': {
             'summary': 'Подробная информация о жанре',
             'description': 'Вывод подробной информации о жанре',
             'response_description': 'uuid, название, описание',
         },
+        'retrieve_many': {
+            'summary': 'Несколько жанров по uuid',
+            'description': 'Подробная информация о жанрах одним запросом',
+            'response_description': 'uuid, название, описание',
+        },
         'retrieve_list': {
             'summary': 'Список жанров',
             'description': ('Список жанров с пагинацией \
                             и сортировкой по названию'),
             'response_description': 'uuid, название',
         },
+        'retrieve_relation': {
+            'summary': 'Фильмы жанра',
+            'description': 'Постраничный вывод списка фильмов жанра',
+            'response_description': 'uuid, название, рейтинг',
+        },
     }
+
+    @classmethod
+    def relation_query(cls, id):
+        # Жанры хранятся в документах фильмов
+        return {'nested': {
+            'path': 'genre', 'query': {'term': {'genre.id': id}},
+        }}
@@ -21,6 +21,11 @@ class PersonsViewSet(ViewSet, RelationViewMixin):
             'description': 'Вывод подробной информации о человеке',
             'response_description': 'uuid, имя, роль, фильмы, фильмы по ролям',
         },
+        'retrieve_many': {
+            'summary': 'Несколько человек по uuid',
+            'description': 'Подробная информация о людях одним запросом',
+            'response_description': 'uuid, имя, роль, фильмы, фильмы по ролям',
+        },
         'retrieve_list': {
             'summary': 'Список людей',
             'description': 'Постраничный список людей с фильтром по ролям',
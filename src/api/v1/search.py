@@ -0,0 +1,33 @@
+import asyncio
+
+from core.fastapi_viewset.schemas import SuggestQuery
+from core.utils.text import normalize_text
+from fastapi import APIRouter, Depends
+from models.base import source_includes
+from models.suggest import (FilmSuggestModel, PersonSuggestModel,
+                            SuggestResponseModel)
+from services.films import Films
+from services.persons import Persons
+
+router = APIRouter()
+
+
+@router.get(
+    '/search/suggest',
+    response_model=SuggestResponseModel,
+    summary='Подсказки поиска',
+    description=('Фильмы и люди, название или имя которых '
+                 'начинается с введенного текста'),
+    response_description='uuid и название фильмов, uuid и имя людей',
+)
+async def suggest(query: SuggestQuery = Depends()):
+    # Регистр и лишние пробелы не меняют подсказки и ключ кэша
+    prefix = normalize_text(query.prefix)
+    if not prefix:
+        return {'films': [], 'persons': []}
+    films, persons = await asyncio.gather(
+        Films.suggest(prefix, query.size, source_includes(FilmSuggestModel)),
+        Persons.suggest(
+            prefix, query.size, source_includes(PersonSuggestModel)),
+    )
+    return {'films': films, 'persons': persons}
@@ -33,7 +33,23 @@ class Filter:
         _filter: Optional[str] = Query(
             None,
             title='Фильтр',
-            description='Фильтрует по жанрам',
-            alias='filter[genre]')
+            description='Фильтрует по жанрам, uuid через запятую',
+            alias='filter[genre]'),
+        rating_gte: Optional[float] = Query(
+            None,
+            title='Рейтинг от',
+            description='Фильтрует по рейтингу не ниже значения',
+            alias='filter[imdb_rating][gte]',
+            ge=0,
+            le=10),
+        rating_lte: Optional[float] = Query(
+            None,
+            title='Рейтинг до',
+            description='Фильтрует по рейтингу не выше значения',
+            alias='filter[imdb_rating][lte]',
+            ge=0,
+            le=10),
     ):
         self.filter = _filter
+        self.rating_gte = rating_gte
+        self.rating_lte = rating_lte
@@ -1,7 +1,8 @@
 from enum import Enum
 from typing import Optional
 
-from fastapi import Query
+from core.utils.translation import gettext_lazy as _
+from fastapi import HTTPException, Query, status
 
 
 class PersonRoleEnum(str, Enum):
@@ -16,10 +17,19 @@ class Filter:
 
     def __init__(
         self,
-        _filter: Optional[PersonRoleEnum] = Query(
+        _filter: Optional[str] = Query(
             None,
             title='Фильтрация',
-            description='Фильтрует по роли персонажа',
+            description='Фильтрует по ролям персонажа через запятую',
             alias='filter[role]')
     ) -> None:
-        self.filter = _filter
+        self.filter = None
+        if _filter is not None:
+            try:
+                self.filter = [PersonRoleEnum(role.strip())
+                               for role in _filter.split(',')
+                               if role.strip()]
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=_('Invalid filter'))
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import math
+from time import monotonic
+from typing import List, Optional
+
+from core import config
+from core.metrics import metrics
+from db.cache import AbstractCache
+
+from .films import FilmsViewSet
+from .genres import GenresViewSet
+from .persons import PersonsViewSet
+from .utils.films import FilmSortEnum
+from .utils.genres import GenreSortEnum
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_page(view, semaphore: asyncio.Semaphore,
+                    params: dict) -> Optional[dict]:
+    # Запрос строится так же, как в API, поэтому ключи кэша совпадают
+    index = view.model.index
+    async with semaphore:
+        try:
+            docs = await view.get_query(params, schema=view.output_schema)
+        except Exception:
+            logger.exception('Warming %s %s failed', index, params)
+            return None
+    metrics.incr(f'warming.pages.{index}')
+    return docs
+
+
+async def warm_pages(view, semaphore: asyncio.Semaphore,
+                     params: dict, pages: Optional[int] = None) -> List[dict]:
+    """Первые pages страниц списка (все, если не задано), их документы"""
+    first = await warm_page(view, semaphore, params)
+    if not first:
+        return []
+    count = first['hits']['total']['value']
+    total = math.ceil(count / config.PAGE_SIZE)
+    if pages is not None:
+        total = min(total, pages)
+    rest = await asyncio.gather(*(
+        warm_page(view, semaphore, {**params, 'page[number]': number})
+        for number in range(2, total + 1)
+    ))
+    return [hit['_source']
+            for docs in [first, *rest] if docs
+            for hit in docs['hits']['hits']]
+
+
+async def warm_popular(view, cache: AbstractCache,
+                       semaphore: asyncio.Semaphore) -> None:
+    ids = await cache.get_popular(view.model.index, config.CACHE_WARM_TOP)
+    if ids:
+        async with semaphore:
+            await view.model.get_many(ids)
+
+
+async def warm(cache: AbstractCache) -> None:
+    """
+    Заполняет кэш данными самых частых запросов: первыми страницами
+    фильмов по всем сортировкам и жанрам, всеми жанрами и популярными
+    объектами. Число одновременных запросов к хранилищу ограничено,
+    чтобы не мешать обслуживанию клиентов
+    """
+    if not await cache.lock('warming', config.CACHE_WARM_LOCK):
+        logger.info('Cache warming skipped: done by another worker')
+        return
+    started = monotonic()
+    semaphore = asyncio.Semaphore(config.CACHE_WARM_CONCURRENCY)
+    genres = await warm_pages(
+        GenresViewSet, semaphore, {'sort': GenreSortEnum.name_asc.value})
+    await asyncio.gather(
+        *(warm_pages(FilmsViewSet, semaphore,
+                     {'sort': sort.value, 'filter[genre]': genre},
+                     config.CACHE_WARM_PAGES)
+          for sort in FilmSortEnum
+          for genre in [None, *(genre['id'] for genre in genres)]),
+        *(warm_popular(view, cache, semaphore)
+          for view in (FilmsViewSet, GenresViewSet, PersonsViewSet)),
+    )
+    logger.info('Cache warmed in %.2f seconds', monotonic() - started)
+
+
+task: Optional[asyncio.Task] = None
+
+
+def start(cache: AbstractCache) -> None:
+    # Прогрев по сообщению ETL не запускается, пока идет предыдущий
+    global task
+    if config.CACHE_WARM_CONCURRENCY and (task is None or task.done()):
+        task = asyncio.create_task(warm(cache))
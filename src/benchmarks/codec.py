@@ -0,0 +1,101 @@
+"""
+Сравнение форматов записей кэша: объем и время кодирования/декодирования.
+
+Запуск из каталога src:
+    python -m benchmarks.codec [--size 50] [--rounds 200]
+"""
+import argparse
+import random
+import string
+import uuid
+from time import perf_counter
+
+import orjson
+from db.codec import CODECS, decode, encode, trim
+
+
+def word(length: int = 8) -> str:
+    return ''.join(random.choices(string.ascii_lowercase, k=length))
+
+
+def person() -> dict:
+    return {'id': str(uuid.uuid4()), 'name': f'{word()} {word(10)}'}
+
+
+def film() -> dict:
+    actors = [person() for _ in range(random.randint(5, 30))]
+    writers = [person() for _ in range(random.randint(1, 5))]
+    directors = [person() for _ in range(random.randint(1, 3))]
+    return {
+        'id': str(uuid.uuid4()),
+        'title': ' '.join(word() for _ in range(4)),
+        'imdb_rating': round(random.uniform(0, 10), 1),
+        'film_type': random.choice(['movie', 'tv-show']),
+        'description': ' '.join(word() for _ in range(60)),
+        'genre': [{'id': str(uuid.uuid4()), 'name': word()}
+                  for _ in range(random.randint(1, 4))],
+        'actors': actors,
+        'writers': writers,
+        'directors': directors,
+        'actors_names': [item['name'] for item in actors],
+        'writers_names': [item['name'] for item in writers],
+        'directors_names': [item['name'] for item in directors],
+    }
+
+
+def search_response(size: int) -> dict:
+    # Ответ Elasticsearch в том виде, в котором он приходит из клиента
+    return {
+        'took': 3,
+        'timed_out': False,
+        '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0},
+        'hits': {
+            'total': {'value': 1000, 'relation': 'eq'},
+            'max_score': 1.0,
+            'hits': [
+                {'_index': 'movies', '_type': '_doc', '_id': doc['id'],
+                 '_score': 1.0, '_source': doc}
+                for doc in (film() for _ in range(size))
+            ],
+        },
+    }
+
+
+def measure(data: bytes, codec: str, rounds: int) -> tuple:
+    start = perf_counter()
+    for _ in range(rounds):
+        encoded = encode(data, codec, threshold=0)
+    encode_time = (perf_counter() - start) / rounds
+    start = perf_counter()
+    for _ in range(rounds):
+        decode(encoded)
+    decode_time = (perf_counter() - start) / rounds
+    return len(encoded), encode_time, decode_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=50,
+                        help='документов в ответе поиска')
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    docs = search_response(args.size)
+    payloads = {
+        'full': orjson.dumps(docs),
+        'trimmed': orjson.dumps(trim(docs)),
+    }
+    print(f'{"payload":<8} {"codec":<5} {"bytes":>9} {"ratio":>6} '
+          f'{"encode, ms":>11} {"decode, ms":>11}')
+    for payload, data in payloads.items():
+        for codec in CODECS:
+            size, encode_time, decode_time = measure(
+                data, codec, args.rounds)
+            print(f'{payload:<8} {codec:<5} {size:>9} '
+                  f'{size / len(payloads["full"]):>6.2f} '
+                  f'{encode_time * 1000:>11.3f} {decode_time * 1000:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Объем ответа поиска по маршрутам API: весь _source против полей
+модели ответа (_source_includes) и filter_path.
+
+Запуск из каталога src:
+    python -m benchmarks.source [--size 50]
+"""
+import argparse
+import random
+import uuid
+
+import orjson
+from db.elastic import SEARCH_FILTER_PATH
+from models.base import source_includes
+from models.films import FilmsResponseModel
+from models.genres import GenresResponseModel
+from models.persons import PersonsResponseModel
+
+from benchmarks.codec import film, word
+
+
+def person() -> dict:
+    film_ids = [str(uuid.uuid4()) for _ in range(random.randint(1, 40))]
+    return {
+        'id': str(uuid.uuid4()),
+        'full_name': f'{word()} {word(10)}',
+        'roles': random.sample(['actor', 'director', 'writer'], 2),
+        'film_ids': film_ids,
+        'actor_film_ids': film_ids[::2],
+        'director_film_ids': film_ids[1::3],
+        'writer_film_ids': film_ids[2::3],
+    }
+
+
+def genre() -> dict:
+    return {
+        'id': str(uuid.uuid4()),
+        'name': word(),
+        'description': ' '.join(word() for _ in range(30)),
+    }
+
+
+# Маршрут: индекс, генератор документов, модель ответа
+ROUTES = {
+    '/films/': ('movies', film, FilmsResponseModel),
+    '/films/search': ('movies', film, FilmsResponseModel),
+    '/genres/': ('genres', genre, GenresResponseModel),
+    '/persons/': ('persons', person, PersonsResponseModel),
+    '/persons/search': ('persons', person, PersonsResponseModel),
+    '/persons/{id}/films/': ('movies', film, FilmsResponseModel),
+    '/genres/{id}/films/': ('movies', film, FilmsResponseModel),
+}
+
+
+def search_response(index: str, docs: list) -> dict:
+    # Ответ Elasticsearch без filter_path
+    return {
+        'took': 3,
+        'timed_out': False,
+        '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0},
+        'hits': {
+            'total': {'value': 1000, 'relation': 'eq'},
+            'max_score': 1.0,
+            'hits': [
+                {'_index': index, '_type': '_doc', '_id': doc['id'],
+                 '_score': 1.0, '_source': doc, 'sort': [1.0, doc['id']]}
+                for doc in docs
+            ],
+        },
+    }
+
+
+def filtered_response(response: dict, includes: str) -> dict:
+    # То же, что вернет elastic с _source_includes и filter_path
+    fields = includes.split(',')
+    paths = SEARCH_FILTER_PATH.split(',')
+    hits = response['hits']
+    return {'hits': {
+        'total': hits['total'],
+        'hits': [
+            {key: ({field: value for field, value in hit[key].items()
+                    if field in fields} if key == '_source' else hit[key])
+             for key in hit if f'hits.hits.{key}' in paths}
+            for hit in hits['hits']
+        ],
+    }}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=50,
+                        help='документов в ответе поиска')
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f'{"route":<22} {"full":>9} {"filtered":>9} {"ratio":>6}')
+    for route, (index, make_doc, model) in ROUTES.items():
+        response = search_response(
+            index, [make_doc() for _ in range(args.size)])
+        full = len(orjson.dumps(response))
+        filtered = len(orjson.dumps(
+            filtered_response(response, source_includes(model))))
+        print(f'{route:<22} {full:>9} {filtered:>9} {filtered / full:>6.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,28 @@ PROJECT_NAME = os.getenv('PROJECT_NAME', 'movies')
 # Количество результатов на странице
 PAGE_SIZE = int(os.getenv('PAGE_SIZE', 10))
 MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+# Поиск в две фазы: нечеткий запрос выполняется, только если точный
+# по началу фразы нашел меньше SEARCH_FUZZY_THRESHOLD документов
+# (0 - сразу нечеткий). Для нечеткого запроса: сколько первых символов
+# слова должны совпасть и сколько вариантов слова перебирается
+SEARCH_FUZZY_THRESHOLD = int(os.getenv('SEARCH_FUZZY_THRESHOLD', 1))
+SEARCH_PREFIX_LENGTH = int(os.getenv('SEARCH_PREFIX_LENGTH', 1))
+SEARCH_MAX_EXPANSIONS = int(os.getenv('SEARCH_MAX_EXPANSIONS', 50))
+# Количество подсказок поиска каждого вида
+SUGGEST_SIZE = int(os.getenv('SUGGEST_SIZE', 5))
+
+# Сколько найденных документов считать точно, дальше число
+# в ответе - нижняя граница (count_relation: gte)
+TRACK_TOTAL_HITS = int(os.getenv('TRACK_TOTAL_HITS', 10000))
+
+# Страницы одного обхода по курсору читаются из одного снимка индекса
+# (point in time), сколько секунд снимок живет без запросов
+# (0 - без снимков)
+PIT_KEEP_ALIVE = int(os.getenv('PIT_KEEP_ALIVE', 60))
+# Сколько снимков открыто одновременно на все воркеры (0 - без
+# ограничения): каждый держит сегменты индекса в elastic. Сверх
+# предела обход идет без снимка
+PIT_MAX_SESSIONS = int(os.getenv('PIT_MAX_SESSIONS', 100))
 
 # Настройки Redis
 REDIS_HOST = os.getenv('REDIS_HOST', '127.0.0.1')
@@ -22,10 +44,69 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 
 # Время хранения кэша 5 минут
 CACHE_EXPIRE_IN_SECONDS = int(os.getenv('CACHE_EXPIRE_IN_SECONDS', 30))
+# Сколько секунд после истечения отдавать устаревшие данные,
+# обновляя их в фоне (0 - отключено)
+CACHE_STALE_IN_SECONDS = int(os.getenv('CACHE_STALE_IN_SECONDS', 0))
+# Случайная добавка к срокам, доля срока
+CACHE_EXPIRE_JITTER = float(os.getenv('CACHE_EXPIRE_JITTER', 0.1))
+# Сроки по индексам и видам запросов (detail, list, search, relation),
+# negative - для отсутствующих документов, max_ttl - верхняя граница
+# срока, подстраиваемого под частоту изменений индекса:
+# {"genres": {"ttl": 3600, "search": {"ttl": 60}},
+#  "movies": {"ttl": 30, "stale": 300, "negative": 10, "max_ttl": 600}}
+CACHE_POLICY = orjson.loads(os.getenv('CACHE_POLICY', '{}'))
+
+# Сколько секунд помнить, что документа нет в индексе
+CACHE_NEGATIVE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL', 10))
+
+# Канал, в который ETL публикует идентификаторы измененных документов
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL',
+                                       'cache:invalidate')
+
+# Как часто перечитывать из Redis поколения ключей индексов, секунды
+CACHE_GENERATION_REFRESH = float(os.getenv('CACHE_GENERATION_REFRESH', 5))
+# Как часто перечитывать из Redis фильтры Блума, секунды
+CACHE_BLOOM_REFRESH = float(os.getenv('CACHE_BLOOM_REFRESH', 60))
+
+# Формат сжатия записей кэша: raw, zlib, lzma, lz4 или zstd
+# (lz4 и zstd при установленных пакетах lz4 и zstandard)
+CACHE_CODEC = os.getenv('CACHE_CODEC', 'zlib')
+# Записи меньше порога сохраняются без сжатия, байты
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv('CACHE_COMPRESS_MIN_BYTES', 1024))
+
+# Прогрев кэша при старте и после работы ETL: число одновременных
+# запросов (0 - отключен), страниц списков и популярных объектов
+CACHE_WARM_CONCURRENCY = int(os.getenv('CACHE_WARM_CONCURRENCY', 4))
+CACHE_WARM_PAGES = int(os.getenv('CACHE_WARM_PAGES', 3))
+CACHE_WARM_TOP = int(os.getenv('CACHE_WARM_TOP', 100))
+# Прогрев выполняет один воркер, повторный - не раньше, чем через
+CACHE_WARM_LOCK = int(os.getenv('CACHE_WARM_LOCK', 60))
+# Как часто сохранять счетчики запросов объектов и сколько их хранить
+CACHE_POPULAR_FLUSH = float(os.getenv('CACHE_POPULAR_FLUSH', 10))
+CACHE_POPULAR_MAX = int(os.getenv('CACHE_POPULAR_MAX', 10000))
+
+# Локальный кэш процесса перед Redis (0 - отключен)
+CACHE_LOCAL_TTL = float(os.getenv('CACHE_LOCAL_TTL', 5))
+CACHE_LOCAL_MAX_ITEMS = int(os.getenv('CACHE_LOCAL_MAX_ITEMS', 1000))
+CACHE_LOCAL_MAX_BYTES = int(os.getenv('CACHE_LOCAL_MAX_BYTES', 16 * 2 ** 20))
+# Емкость по префиксам: {"movies": {"items": 5000, "bytes": 67108864}}
+CACHE_LOCAL_CAPACITY = orjson.loads(os.getenv('CACHE_LOCAL_CAPACITY', '{}'))
+
+# Сколько секунд клиенты и прокси хранят ответ без проверки по ETag
+# (0 - проверяют каждый раз): о сбросе кэша API они не узнают
+CACHE_CLIENT_MAX_AGE = int(os.getenv('CACHE_CLIENT_MAX_AGE', 5))
+
+# Ответы меньше порога отдаются без сжатия, байты
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES',
+                                            1024))
 
 # Настройки Elasticsearch
 ELASTIC_HOST = os.getenv('ELASTIC_HOST', '127.0.0.1')
 ELASTIC_PORT = int(os.getenv('ELASTIC_PORT', 9200))
+# Поиски, пришедшие в течение окна, миллисекунды (0 - отключено),
+# отправляются одним _msearch, не больше ELASTIC_MSEARCH_MAX за раз
+ELASTIC_MSEARCH_WINDOW = float(os.getenv('ELASTIC_MSEARCH_WINDOW', 0))
+ELASTIC_MSEARCH_MAX = int(os.getenv('ELASTIC_MSEARCH_MAX', 50))
 ELASTIC_INDEX = orjson.loads(os.getenv(
     'ELASTIC_INDEX',
     '{"films": "movies", "genres": "genres", "persons": "persons"}'
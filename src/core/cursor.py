@@ -0,0 +1,45 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from typing import List, NamedTuple, Optional
+
+import orjson
+
+# Поле, по которому упорядочиваются документы с одинаковыми
+# значениями сортировки: без него курсор может пропускать документы
+TIEBREAKER = 'id:asc'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Cursor(NamedTuple):
+    # Значения сортировки последнего документа страницы
+    # и сессия обхода со снимком индекса
+    after: List
+    session: Optional[str] = None
+
+
+def encode_cursor(sort_values: List, session: Optional[str] = None) -> str:
+    # Непрозрачный для клиента курсор
+    data = {'after': sort_values}
+    if session:
+        data['session'] = session
+    token = urlsafe_b64encode(orjson.dumps(data))
+    return token.rstrip(b'=').decode()
+
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        padding = '=' * (-len(token) % 4)
+        data = orjson.loads(urlsafe_b64decode(token + padding))
+    except (BinasciiError, ValueError) as error:
+        raise InvalidCursor(token) from error
+    if not isinstance(data, dict):
+        raise InvalidCursor(token)
+    after, session = data.get('after'), data.get('session')
+    if not isinstance(after, list) or not after:
+        raise InvalidCursor(token)
+    if session is not None and not isinstance(session, str):
+        raise InvalidCursor(token)
+    return Cursor(after, session)
@@ -0,0 +1,78 @@
+import gzip
+import struct
+from typing import Dict, Optional
+
+from core import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Запись кэша с вариантами ответа: заголовок MAGIC,
+# затем для каждого варианта длина имени, длина данных, имя и данные
+MAGIC = b'RV1'
+ITEM = struct.Struct('>BI')
+
+COMPRESSORS = {
+    'gzip': lambda body: gzip.compress(body, compresslevel=6, mtime=0),
+}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda body: brotli.compress(body, quality=5)
+
+# Кодировки в порядке предпочтения сервера
+PREFERENCE = ('br', 'gzip')
+
+
+def get_variants(body: bytes) -> Dict[str, bytes]:
+    # Сжатые варианты готовятся один раз при записи в кэш,
+    # маленькие ответы не сжимаются
+    variants = {'identity': body}
+    if len(body) >= config.RESPONSE_COMPRESS_MIN_BYTES:
+        for name, compress in COMPRESSORS.items():
+            variants[name] = compress(body)
+    return variants
+
+
+def pack(variants: Dict[str, bytes]) -> bytes:
+    parts = [MAGIC]
+    for name, data in variants.items():
+        name = name.encode()
+        parts.append(ITEM.pack(len(name), len(data)) + name + data)
+    return b''.join(parts)
+
+
+def unpack(data: bytes) -> Dict[str, bytes]:
+    if not data.startswith(MAGIC):
+        # Запись без вариантов
+        return {'identity': data}
+    variants = {}
+    offset = len(MAGIC)
+    while offset < len(data):
+        name_size, size = ITEM.unpack_from(data, offset)
+        offset += ITEM.size
+        name = data[offset:offset + name_size].decode()
+        offset += name_size
+        variants[name] = data[offset:offset + size]
+        offset += size
+    return variants
+
+
+def negotiate(accept_encoding: Optional[str],
+              variants: Dict[str, bytes]) -> str:
+    # Кодировки из Accept-Encoding с ненулевым q
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.partition(';')
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    for name in PREFERENCE:
+        if name in variants and (name in accepted or '*' in accepted):
+            return name
+    return 'identity'
@@ -1,25 +1,59 @@
+from typing import Optional
+
 from core import config
 from core.fastapi_viewset.schemas import Paginator
-from fastapi import Depends, Path, Request
+from core.utils.translation import gettext_lazy as _
+from db import popularity
+from db.tags import doc_tag
+from fastapi import Depends, HTTPException, Path, Request, status
 
-from .schemas import SearchQuery
+from .schemas import BatchQuery, SearchQuery, fields_query
 
 
 class MethodFactory:
 
     @classmethod
-    def make_retrieve(cls, key_name, key_type):
+    def make_retrieve(cls, key_name, key_type, resource=None):
         async def retrieve(
                 cls,
                 request: Request,
                 param: key_type = Path(..., alias=key_name),
+                fields: Optional[str] = Depends(fields_query(resource)),
         ):
-            entity = await cls.retrieve_function(cls.model, id=param)
-            return entity
+            schema, projection = cls.get_detail_schema(fields)
+
+            async def handler():
+                return await cls.retrieve_function(
+                    cls.model, id=str(param), fields=projection)
+            response = await cls.cached_response(request, schema, handler)
+            # Самые запрашиваемые объекты попадают в прогрев кэша,
+            # несуществующие (404) не учитываются
+            popularity.record(cls.model.index, str(param))
+            return response
         return retrieve
 
     @classmethod
-    def make_retrieve_list(cls, filter, sort):
+    def make_retrieve_many(cls, key_type):
+        async def retrieve_many(
+                cls,
+                request: Request,
+                query: BatchQuery = Depends(),
+        ):
+            # Ответ не кэшируется целиком: наборы идентификаторов почти
+            # не повторяются, а каждый объект берется из кэша отдельно.
+            # Отсутствующие объекты пропускаются
+            try:
+                ids = [str(key_type(id)) for id in query.ids]
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=_('Invalid id'))
+            data = await cls.model.get_many(ids)
+            return {'results': [item for item in data if item is not None]}
+        return retrieve_many
+
+    @classmethod
+    def make_retrieve_list(cls, filter, sort, resource=None):
         async def retrieve_list(
             cls,
             request: Request,
@@ -27,36 +61,56 @@ class MethodFactory:
             filter: filter = Depends(),
             sort: sort = Depends(),
             paginator: Paginator = Depends(),
+            fields: Optional[str] = Depends(fields_query(resource)),
         ):
-            params = dict(request.query_params)
-            query = await cls.get_query(params)
-            count = await cls.count(query)
-            data = [hit['_source'] for hit in query['hits']['hits']]
-            total, next, previous = await cls.get_pages(
-                request, count, len(data),
-                paginator.page_number, paginator.page_size
-            )
-            return cls.prepare_response(count, total, next, previous, data)
+            if request.method == 'HEAD':
+                return await cls.count_response(
+                    cls.get_params(request, sort), paginator)
+            schema, list_schema = cls.get_list_schemas(fields)
+
+            async def handler():
+                params = cls.get_params(request, sort)
+                query = await cls.get_query(params, schema=schema)
+                count = await cls.count(query)
+                data = [hit['_source'] for hit in query['hits']['hits']]
+                total, next, previous = await cls.get_page_links(
+                    request, count, query, paginator)
+                return cls.prepare_response(
+                    count, total, next, previous, data,
+                    cls.count_relation(query))
+            return await cls.cached_response(
+                request, list_schema, handler, kind='list')
         return retrieve_list
 
     @classmethod
-    def make_retrieve_search(cls):
+    def make_retrieve_search(cls, resource=None, filter=object):
         async def retrieve_search(
             cls,
             request: Request,
             *,
             query: SearchQuery = Depends(),
+            filter: filter = Depends(),
             paginator: Paginator = Depends(),
+            fields: Optional[str] = Depends(fields_query(resource)),
         ):
-            params = dict(request.query_params)
-            query = await cls.get_query(params)
-            count = await cls.count(query)
-            data = [hit['_source'] for hit in query['hits']['hits']]
-            total, next, previous = await cls.get_pages(
-                request, count, len(data),
-                paginator.page_number, paginator.page_size
-            )
-            return cls.prepare_response(count, total, next, previous, data)
+            if request.method == 'HEAD':
+                return await cls.count_response(
+                    dict(request.query_params), paginator, kind='search')
+            schema, list_schema = cls.get_list_schemas(fields)
+
+            async def handler():
+                params = dict(request.query_params)
+                query = await cls.get_query(
+                    params, kind='search', schema=schema)
+                count = await cls.count(query)
+                data = [hit['_source'] for hit in query['hits']['hits']]
+                total, next, previous = await cls.get_page_links(
+                    request, count, query, paginator)
+                return cls.prepare_response(
+                    count, total, next, previous, data,
+                    cls.count_relation(query))
+            return await cls.cached_response(
+                request, list_schema, handler, kind='search')
         return retrieve_search
 
     @classmethod
@@ -67,16 +121,28 @@ class MethodFactory:
                 param: key_type = Path(..., alias=key_name),
                 paginator: Paginator = Depends(),
         ):
-            entity = await cls.retrieve_function(cls.model, id=param)
-            params = dict(request.query_params)
-            params['_index'] = config.ELASTIC_INDEX[index]
-            params['body'] = {'query': {'ids': {'values': entity['film_ids']}}}
-            query = await cls.get_query(params)
-            count = await cls.count(query)
-            data = [hit['_source'] for hit in query['hits']['hits']]
-            total, next, previous = await cls.get_pages(
-                request, count, len(data),
-                paginator.page_number, paginator.page_size
-            )
-            return cls.prepare_response(count, total, next, previous, data)
+            async def handler():
+                params = dict(request.query_params)
+                params['_index'] = config.ELASTIC_INDEX[index]
+                params['body'] = {'query': cls.relation_query(str(param))}
+                # Список связанных берется из документа param: при его
+                # изменении сбрасываются и поиск, и число документов
+                query = await cls.get_query(
+                    params, kind='relation',
+                    schema=cls.output_relation_schema,
+                    tags=[doc_tag(cls.model.index, str(param))])
+                count = await cls.count(query)
+                if not count:
+                    # Пустой ответ: для несуществующего объекта - 404
+                    await cls.retrieve_function(cls.model, id=str(param))
+                data = [hit['_source'] for hit in query['hits']['hits']]
+                total, next, previous = await cls.get_page_links(
+                    request, count, query, paginator)
+                return cls.prepare_response(
+                    count, total, next, previous, data,
+                    cls.count_relation(query))
+            return await cls.cached_response(
+                request, cls.list_relation_schema, handler,
+                index=config.ELASTIC_INDEX[index],
+                tags=[doc_tag(cls.model.index, param)], kind='relation')
         return retrieve_relation
@@ -0,0 +1,75 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple, get_origin
+
+from pydantic import BaseModel, create_model
+
+from .schema_factory import SchemaFactory
+from .schemas import Pagination
+
+
+def get_nested_model(field) -> Optional[type]:
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        return field.type_
+    return None
+
+
+def parse_fields(value: str, model) -> Tuple[str, ...]:
+    """
+    Поля из параметра fields[...]: id,title,genre.name.
+    Поля проверяются по модели документа elastic model,
+    id добавляется всегда: по нему строятся теги кэша
+    """
+    fields = {'id'}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, nested = item.partition('.')
+        field = model.__fields__.get(name)
+        if field is None:
+            raise ValueError(item)
+        if nested:
+            nested_model = get_nested_model(field)
+            if nested_model is None or nested not in nested_model.__fields__:
+                raise ValueError(item)
+        fields.add(item)
+    # Поле целиком включает свои вложенные поля
+    return tuple(sorted(
+        item for item in fields
+        if '.' not in item or item.partition('.')[0] not in fields))
+
+
+@lru_cache(maxsize=256)
+def projection_schema(model, fields: Tuple[str, ...]):
+    # Модель ответа только с полями fields, для каждого набора полей
+    # создается один раз
+    nested: dict = {}
+    for item in fields:
+        name, _, sub = item.partition('.')
+        if sub:
+            nested.setdefault(name, []).append(sub)
+    attrs = {}
+    for item in fields:
+        name = item.partition('.')[0]
+        if name in attrs:
+            continue
+        field = model.__fields__[name]
+        field_type = field.outer_type_
+        if name in nested:
+            sub_model = get_nested_model(field)
+            field_type = create_model(
+                f'{model.__name__}{name.title()}Projection',
+                **{sub: (Optional[sub_model.__fields__[sub].outer_type_],
+                         None)
+                   for sub in nested[name]})
+            if get_origin(field.outer_type_) is list:
+                field_type = List[field_type]
+        attrs[name] = (Optional[field_type], None)
+    return create_model(f'{model.__name__}Projection', **attrs)
+
+
+@lru_cache(maxsize=256)
+def projection_list_schema(model, fields: Tuple[str, ...]):
+    return SchemaFactory.list_schema(
+        projection_schema(model, fields), Pagination,
+        f'{model.__name__}ProjectionListSchema')
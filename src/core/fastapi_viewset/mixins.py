@@ -1,12 +1,24 @@
 import math
+from uuid import UUID
 
+import orjson
+from core import config
+from core.cursor import InvalidCursor, encode_cursor
+from core.metrics import metrics
 from core.utils.translation import gettext_lazy as _
-from fastapi import HTTPException, status
+from db.cache import get_cache
+from db.tags import results_tags
+from fastapi import HTTPException, Response, status
+from models.base import schema_version, source_includes
 
+from .compression import get_variants, negotiate, pack, unpack
 from .dynamic_method import MethodFactory
+from .fields import parse_fields, projection_list_schema, projection_schema
 from .schema_factory import SchemaFactory
-from .schemas import Pagination
-from .utils import get_object_or_404, get_page_url, is_method_overloaded
+from .schemas import Batch, Pagination
+from .utils import (canonical_params, etag_matches, get_cache_headers,
+                    get_cursor_url, get_etag, get_object_or_404,
+                    get_page_url, get_resource_name, is_method_overloaded)
 
 
 class BaseMixin:
@@ -41,17 +53,161 @@ class BaseViewMixin(BaseMixin, metaclass=ViewSetMeta):
     model = None
 
     @classmethod
-    async def get_query(cls, params):
-        query = await cls.model.get_query(params)
-        return await cls.model.search(**query)
+    async def get_query(cls, params, kind='list', schema=None, tags=()):
+        # Из хранилища запрашиваются только поля модели ответа schema,
+        # tags - теги документов, от которых зависит запрос
+        if schema is not None:
+            params = {**params, '_source': source_includes(schema)}
+        try:
+            query = await cls.model.get_query(params)
+        except InvalidCursor:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=_('Invalid cursor'))
+        query, docs = await cls.model.choose_phase(query, kind, tags)
+        if docs is not None:
+            return docs
+        if 'session' in query:
+            return await cls.model.search_session(
+                kind=kind, tags=tags, **query)
+        return await cls.model.search(kind=kind, tags=tags, **query)
+
+    @classmethod
+    def get_projection(cls, fields):
+        # Набор полей из fields[...] или None - все поля
+        if fields is None:
+            return None
+        try:
+            return parse_fields(fields, cls.input_schema)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=_('Invalid fields'))
+
+    @classmethod
+    def get_detail_schema(cls, fields):
+        # Модель ответа и поля документа для _source_includes
+        projection = cls.get_projection(fields)
+        if projection is None:
+            return cls.output_detail_schema, None
+        return (projection_schema(cls.input_schema, projection),
+                ','.join(projection))
+
+    @classmethod
+    def get_list_schemas(cls, fields):
+        # Модели элемента списка и всего ответа
+        projection = cls.get_projection(fields)
+        if projection is None:
+            return cls.output_schema, cls.list_schema
+        return (projection_schema(cls.input_schema, projection),
+                projection_list_schema(cls.input_schema, projection))
+
+    @classmethod
+    def get_params(cls, request, sort=None) -> dict:
+        params = dict(request.query_params)
+        # Запрос без sort совпадает с запросом с сортировкой по умолчанию
+        default = getattr(sort, 'sort', None)
+        if default and not params.get('sort'):
+            params['sort'] = getattr(default[0], 'value', default[0])
+        return params
+
+    @classmethod
+    async def get_response_key(cls, request, schema, index=None,
+                               kind='detail') -> str:
+        # Канонический запрос: адрес и параметры в канонической форме,
+        # адрес включает хост, так как ссылки пагинации абсолютные.
+        # Версия ключа - хеш схемы ответа и поколение индекса документов,
+        # у списков еще и ревизия индекса.
+        # Считаем, сколько запросов отличались от канонических только
+        # формой записи и получили общий ключ
+        cache = await get_cache()
+        raw = request.query_params.multi_items()
+        params = canonical_params(raw)
+        metrics.incr(f'query.total.{cls.model.index}')
+        if params != raw:
+            metrics.incr(f'query.collapsed.{cls.model.index}')
+        query = {'url': str(request.url.replace(query='')), 'params': params}
+        version = schema_version(schema)
+        if index and index != cls.model.index:
+            version += f'.{await cache.get_generation(index)}'
+        if kind != 'detail':
+            version += f'.{await cache.get_revision(index or cls.model.index)}'
+        return await cache.get_key(cls.model.index, query, version)
+
+    @classmethod
+    async def cached_response(cls, request, schema, handler,
+                              index=None, tags=(), kind='detail') -> Response:
+        # Готовое тело ответа хранится в кэше в виде байтов и отдается
+        # без декодирования, валидации и повторной сериализации.
+        # Ответ об одном объекте помечается тегом документа, списки
+        # сбрасываются сменой ревизии индекса index, а также тегами tags.
+        # Сжатые варианты тела хранятся в той же записи.
+        # Ответ с валидатором ETag, который клиент уже получал,
+        # заменяется на 304 без тела.
+        # Страницы обхода по снимку индекса не кэшируются:
+        # у каждого обхода свой снимок и свои ссылки
+        cache = await get_cache()
+        policy = cls.model.get_policy(kind)
+        session = (config.PIT_KEEP_ALIVE
+                   and request.query_params.get('page[after]') is not None)
+        cached, max_age = None, None
+        if not session:
+            key = await cls.get_response_key(request, schema, index, kind)
+            cached, max_age = await cache.get_with_ttl(key)
+        if cached:
+            variants = unpack(cached)
+        else:
+            data = await handler()
+            body = orjson.dumps(schema.parse_obj(data).dict())
+            variants = get_variants(body)
+            if not session:
+                if kind == 'detail':
+                    tags = {*tags, *results_tags(cls.model.index, data)}
+                max_age = policy.spread(policy.ttl)
+                await cache.set(key, pack(variants), expire=max_age,
+                                tags=tags)
+        encoding = negotiate(request.headers.get('accept-encoding'), variants)
+        etag = get_etag(variants['identity'], encoding)
+        # Клиенты и прокси хранят ответ не дольше, чем он живет в кэше
+        headers = get_cache_headers(policy, etag, int(max_age or 0))
+        if session:
+            headers['Cache-Control'] = 'no-store'
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        content = variants[encoding]
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+            metrics.incr(f'response.compressed.{encoding}')
+            metrics.incr(f'response.bytes_saved.{encoding}',
+                         len(variants['identity']) - len(content))
+        return Response(content=content, media_type='application/json',
+                        headers=headers)
 
     @classmethod
     async def count(cls, query):
         return int(query.get('hits').get('total').get('value', 0))
 
+    @classmethod
+    def count_relation(cls, query):
+        return query.get('hits').get('total').get('relation', 'eq')
+
+    @classmethod
+    async def count_response(cls, params, paginator,
+                             kind='list') -> Response:
+        # HEAD: только число документов в заголовках.
+        # Курсор на число документов не влияет
+        params.pop('page[after]', None)
+        query, _ = await cls.model.choose_phase(
+            await cls.model.get_query(params), kind)
+        count = await cls.model.get_count(query)
+        total_pages = int(math.ceil(count / float(paginator.page_size)))
+        return Response(headers={'X-Total-Count': str(count),
+                                 'X-Total-Pages': str(total_pages)})
+
     @classmethod
     async def get_pages(cls, request, count, num_results,
-                        page_number, page_size):
+                        page_number, page_size, exact=True):
         total_pages, next_page, previous_page = None, None, None
         if page_number > 1:
             previous_page = page_number - 1
@@ -59,7 +215,8 @@ class BaseViewMixin(BaseMixin, metaclass=ViewSetMeta):
         if previous_items + num_results < count:
             next_page = page_number + 1
         total_pages: int = int(math.ceil(count / float(page_size)))
-        if count > 0 and page_number > total_pages:
+        # За нижней границей числа документов страницы тоже есть
+        if count > 0 and page_number > total_pages and exact:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail=_('Invalid page'))
         if count == 0 and page_number > 1:
@@ -72,9 +229,35 @@ class BaseViewMixin(BaseMixin, metaclass=ViewSetMeta):
         return total_pages, next_page_url, previous_page_url
 
     @classmethod
-    def prepare_response(cls, count, total, next, previous, data):
+    async def get_cursor_pages(cls, request, count, hits, page_size,
+                               session=None):
+        # Ссылка next несет курсор последнего документа страницы
+        # и сессию обхода, по курсору можно идти только вперед
+        total_pages: int = int(math.ceil(count / float(page_size)))
+        next_page_url = None
+        if len(hits) == page_size and hits[-1].get('sort'):
+            next_page_url = await get_cursor_url(
+                request, encode_cursor(hits[-1]['sort'], session))
+        return total_pages, next_page_url, None
+
+    @classmethod
+    async def get_page_links(cls, request, count, query, paginator):
+        hits = query['hits']['hits']
+        if paginator.page_after is not None:
+            return await cls.get_cursor_pages(
+                request, count, hits, paginator.page_size,
+                query.get('session'))
+        return await cls.get_pages(
+            request, count, len(hits),
+            paginator.page_number, paginator.page_size,
+            cls.count_relation(query) == 'eq')
+
+    @classmethod
+    def prepare_response(cls, count, total, next, previous, data,
+                         relation='eq'):
         data = {
             'count': count,
+            'count_relation': relation,
             'total_pages': total,
             'next': next,
             'previous': previous,
@@ -85,11 +268,14 @@ class BaseViewMixin(BaseMixin, metaclass=ViewSetMeta):
 
 class SingleObjectMixin:
     key_name = 'id'
-    key_type = str
+    # Некорректный идентификатор отклоняется маршрутизатором
+    key_type = UUID
     retrieve_function = get_object_or_404
 
 
 class RetrieveViewMixin(SingleObjectMixin, BaseViewMixin):
+    many_schema = None
+
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         if not is_method_overloaded(cls, 'retrieve'):
@@ -97,8 +283,21 @@ class RetrieveViewMixin(SingleObjectMixin, BaseViewMixin):
                 MethodFactory.make_retrieve(
                     cls.key_name,
                     cls.key_type,
+                    get_resource_name(cls),
                 ),
             )
+        model = getattr(cls, 'model', None)
+        if model is not None:
+            if cls.many_schema is None:
+                cls.many_schema = SchemaFactory.list_schema(
+                    cls.output_detail_schema,
+                    Batch,
+                    f'{model.__name__.title()}BatchSchema',
+                )
+            if not is_method_overloaded(cls, 'retrieve_many'):
+                cls.retrieve_many = classmethod(
+                    MethodFactory.make_retrieve_many(cls.key_type),
+                )
 
 
 class BaseListViewMixin():
@@ -126,7 +325,8 @@ class BaseListViewMixin():
                 cls.retrieve_list = classmethod(
                     MethodFactory.make_retrieve_list(
                         cls.filter_schema,
-                        cls.sort_schema
+                        cls.sort_schema,
+                        get_resource_name(cls),
                     ),
                 )
 
@@ -139,7 +339,9 @@ class SearchViewMixin():
         if model is not None:
             if not is_method_overloaded(cls, 'retrieve_search'):
                 cls.retrieve_search = classmethod(
-                    MethodFactory.make_retrieve_search(),
+                    MethodFactory.make_retrieve_search(
+                        get_resource_name(cls),
+                        cls.filter_schema or object),
                 )
 
 
@@ -149,14 +351,27 @@ class ListViewMixin(BaseViewMixin, BaseListViewMixin):
 
 class RelationViewMixin(SingleObjectMixin, BaseViewMixin):
     list_relation_schema = None
+    # Поле документа model со списком идентификаторов связанных документов
+    relation_path = 'film_ids'
+
+    @classmethod
+    def relation_query(cls, id):
+        # Связанные документы одним запросом: elastic сам берет список
+        # идентификаторов из документа id (terms lookup)
+        return {'terms': {'id': {
+            'index': cls.model.index, 'id': id, 'path': cls.relation_path,
+        }}}
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         related_model = getattr(cls, 'related_model', None)
         if cls.list_relation_schema is None:
+            # Имя схемы уникально для пары моделей: одну связанную модель
+            # могут выводить несколько представлений
             cls.list_relation_schema = SchemaFactory.list_schema(
                 cls.output_relation_schema,
                 cls.base_list_schema,
+                f'{cls.model.__name__.title()}'
                 f'{related_model.__name__.title()}ListRelationSchema',
             )
         if not is_method_overloaded(cls, 'retrieve_relation'):
@@ -6,7 +6,8 @@ from .utils import camel_to_snake_case
 class MainRouter(APIRouter):
     @classmethod
     def _build_single_obj_path(cls, base_path, name='id', annotation=str):
-        return f'{base_path}{{{name}:{annotation.__name__}}}'
+        # Имя конвертера пути Starlette: str, int, uuid
+        return f'{base_path}{{{name}:{annotation.__name__.lower()}}}'
 
     def view(self, base_path: str = '', tags: list = None, **kwargs):
         def decorator(view):
@@ -23,8 +24,10 @@ class MainRouter(APIRouter):
 
             if hasattr(view, 'retrieve_search'):
                 docum_api = view.docum_api.get('retrieve_search') or {}
-                method = self.get(
+                # HEAD - только число документов
+                method = self.api_route(
                     path=base_path + 'search',
+                    methods=['GET', 'HEAD'],
                     response_model=view.list_schema,
                     tags=tags,
                     **kwargs,
@@ -32,6 +35,19 @@ class MainRouter(APIRouter):
                 )
                 method(view.retrieve_search)
 
+            # Регистрируется до маршрута объекта,
+            # иначе batch будет принят за идентификатор
+            if hasattr(view, 'retrieve_many'):
+                docum_api = view.docum_api.get('retrieve_many') or {}
+                method = self.get(
+                    path=base_path + 'batch',
+                    response_model=view.many_schema,
+                    tags=tags,
+                    **kwargs,
+                    **docum_api
+                )
+                method(view.retrieve_many)
+
             if hasattr(view, 'retrieve'):
                 docum_api = view.docum_api.get('retrieve') or {}
                 method = self.get(
@@ -45,8 +61,9 @@ class MainRouter(APIRouter):
 
             if hasattr(view, 'retrieve_list'):
                 docum_api = view.docum_api.get('retrieve_list') or {}
-                method = self.get(
+                method = self.api_route(
                     path=base_path,
+                    methods=['GET', 'HEAD'],
                     response_model=view.list_schema,
                     tags=tags,
                     **kwargs,
@@ -64,4 +81,6 @@ class MainRouter(APIRouter):
                     **docum_api)
                 method(view.retrieve_relation)
 
+            return view
+
         return decorator
@@ -1,18 +1,27 @@
-from typing import Optional
+from typing import List, Optional
 
 from core import config
-from fastapi import Query
+from core.cursor import InvalidCursor, decode_cursor
+from core.utils.translation import gettext_lazy as _
+from fastapi import HTTPException, Query, status
 from pydantic import BaseModel
 
 
 class Pagination(BaseModel):
     """Модель ответа API с пагинацией"""
     count: int
+    # gte - число документов не меньше count
+    count_relation: str = 'eq'
     total_pages: int
     next: Optional[str] = None
     previous: Optional[str] = None
 
 
+class Batch(BaseModel):
+    """Модель ответа API со списком объектов по идентификаторам"""
+    pass
+
+
 class Paginator:
     """Добавление пагинации в параметры запроса"""
 
@@ -31,9 +40,24 @@ class Paginator:
             alias='page[size]',
             ge=1,
             le=config.MAX_PAGE_SIZE),
+        page_after: Optional[str] = Query(
+            None,
+            title='Курсор',
+            description=('Курсор из ссылки next, пустое значение '
+                         'включает постраничный вывод по курсору'),
+            alias='page[after]'),
     ) -> None:
         self.page_number = page_number or 1
         self.page_size = page_size or config.PAGE_SIZE
+        # None - постраничный вывод по номерам страниц
+        self.page_after = page_after
+        if page_after:
+            try:
+                decode_cursor(page_after)
+            except InvalidCursor:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=_('Invalid cursor'))
 
 
 class SearchQuery:
@@ -46,3 +70,54 @@ class SearchQuery:
         description='Слово или фраза')
     ) -> None:
         self.search_text = query
+
+
+class SuggestQuery:
+    """Начало названия или имени для подсказок поиска"""
+
+    def __init__(
+        self,
+        query: str = Query(
+            ...,
+            min_length=1,
+            max_length=50,
+            title='Начало слова или фразы',
+            description='Начало названия фильма или имени человека'),
+        size: int = Query(
+            None,
+            title='Количество подсказок',
+            description='Количество подсказок каждого вида',
+            ge=1,
+            le=config.MAX_PAGE_SIZE),
+    ) -> None:
+        self.prefix = query
+        self.size = size or config.SUGGEST_SIZE
+
+
+def fields_query(resource: Optional[str] = None):
+    """Поля ответа: fields[films]=id,title,genre.name"""
+
+    def fields(value: Optional[str] = Query(
+        None,
+        title='Поля ответа',
+        description='Поля объекта через запятую, вложенные - через точку',
+        alias=f'fields[{resource}]' if resource else 'fields')
+    ) -> Optional[str]:
+        return value
+    return fields
+
+
+class BatchQuery:
+    """Идентификаторы объектов: ids=1&ids=2 или ids=1,2"""
+
+    def __init__(self, ids: List[str] = Query(
+        ...,
+        title='Идентификаторы',
+        description='Идентификаторы объектов через запятую')
+    ) -> None:
+        self.ids = [id.strip() for value in ids for id in value.split(',')
+                    if id.strip()]
+        if len(self.ids) > config.MAX_PAGE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=_('Too many ids'))
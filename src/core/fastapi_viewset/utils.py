@@ -1,9 +1,20 @@
 import re
+from typing import Optional
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
+import xxhash
+from core import config
+from core.utils.text import normalize_text, split_values
 from core.utils.translation import gettext_lazy as _
+from db.policy import CachePolicy
 from fastapi import HTTPException, status
 
+# Параметры со списком значений через запятую, порядок которых
+# не влияет на ответ
+LIST_PARAMS = ('filter[genre]', 'filter[role]')
+# Значения по умолчанию: запрос с ними совпадает с запросом без них
+DEFAULT_PARAMS = {'page[number]': '1', 'page[size]': str(config.PAGE_SIZE)}
+
 
 def is_method_overloaded(cls, method_name) -> bool:
     method = getattr(cls, method_name, False)
@@ -14,18 +25,43 @@ def camel_to_snake_case(words: str):
     return re.sub('([A-Z][a-z]+)', r'\1_', words).rstrip('_').lower()
 
 
+def get_resource_name(view) -> Optional[str]:
+    # Имя ресурса в пути и параметрах: films, genres, persons
+    model = getattr(view, 'model', None)
+    if model is None:
+        return None
+    return camel_to_snake_case(model.__name__)
+
+
 def create_meta_class(model, **kwargs):
     return type('Meta', (), {'model': model, **kwargs})
 
 
-async def get_object_or_404(model, id):
-    obj = await model.get(id)
+async def get_object_or_404(model, id, fields=None):
+    obj = await model.get(id, fields)
     if obj is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=_(f'{model.__name__} not found'))
     return obj
 
 
+def canonical_params(params) -> list:
+    # Параметры запроса без различий в форме записи: регистра и пробелов
+    # в тексте поиска, порядка значений фильтров, ведущих нулей
+    # и значений по умолчанию
+    canonical = []
+    for name, value in params:
+        if name == 'query':
+            value = normalize_text(value)
+        elif name in LIST_PARAMS:
+            value = ','.join(sorted(split_values(value)))
+        elif name in DEFAULT_PARAMS and value.isdigit():
+            value = str(int(value))
+        if DEFAULT_PARAMS.get(name) != value:
+            canonical.append((name, value))
+    return sorted(canonical)
+
+
 async def get_page_url(request, page):
     if page is None:
         return None
@@ -37,3 +73,48 @@ async def get_page_url(request, page):
     query.update(params)
     url_parts[4] = urlencode(query, safe='[]')
     return urlunparse(url_parts)
+
+
+async def get_cursor_url(request, cursor):
+    url_parts = list(urlparse(str(request.url)))
+    query = dict(parse_qsl(url_parts[4], keep_blank_values=True))
+    query.pop('page[number]', None)
+    query['page[after]'] = cursor
+    url_parts[4] = urlencode(query, safe='[]')
+    return urlunparse(url_parts)
+
+
+def get_etag(body: bytes, encoding: str = 'identity') -> str:
+    # Сильный валидатор: одинаковые байты ответа - одинаковый ETag,
+    # сжатые варианты ответа различаются суффиксом
+    digest = xxhash.xxh3_64_hexdigest(body)
+    if encoding != 'identity':
+        return f'"{digest}-{encoding}"'
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match сравнивается слабо: префикс W/ не учитывается
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+def get_cache_headers(policy: CachePolicy, etag: str, max_age: int) -> dict:
+    # Сброс кэша API не достигает клиентов и прокси, поэтому они
+    # хранят ответ недолго, а затем проверяют его по ETag (ответ 304)
+    max_age = min(max_age, config.CACHE_CLIENT_MAX_AGE)
+    if max_age > 0:
+        cache_control = f'public, max-age={max_age}'
+        if policy.stale:
+            stale = min(policy.stale, max_age)
+            cache_control += f', stale-while-revalidate={stale}'
+    else:
+        cache_control = 'no-cache'
+    return {
+        'ETag': etag,
+        'Cache-Control': cache_control,
+        # nginx сжимает ответы, сжатые и несжатые хранятся отдельно
+        'Vary': 'Accept-Encoding',
+    }
@@ -0,0 +1,37 @@
+from collections import Counter, defaultdict
+
+
+class Metrics:
+    """Счетчики и гистограммы процесса воркера"""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.histograms = defaultdict(Counter)
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def observe(self, name: str, value) -> None:
+        self.histograms[name][value] += 1
+
+    def rate(self, part: str, total: str) -> dict:
+        # Доли счетчиков part.<suffix> от счетчиков total.<suffix>
+        rates = {}
+        for name, value in self.counters.items():
+            if name.startswith(f'{total}.') and value:
+                suffix = name[len(total) + 1:]
+                rates[suffix] = self.counters[f'{part}.{suffix}'] / value
+        return rates
+
+    def snapshot(self) -> dict:
+        return {
+            'counters': dict(self.counters),
+            'histograms': {name: dict(values)
+                           for name, values in self.histograms.items()},
+            'rates': {
+                'query.dedup': self.rate('query.collapsed', 'query.total'),
+            },
+        }
+
+
+metrics = Metrics()
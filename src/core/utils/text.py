@@ -0,0 +1,11 @@
+from typing import List
+
+
+def normalize_text(text: str) -> str:
+    # Регистр и лишние пробелы не влияют на результат поиска
+    return ' '.join(text.split()).lower()
+
+
+def split_values(value: str) -> List[str]:
+    # Несколько значений фильтра через запятую
+    return [item.strip() for item in value.split(',') if item.strip()]
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import math
+import struct
+from typing import Iterable, Iterator, Optional
+
+import xxhash
+from core import config
+
+from db.cache import AbstractCache
+
+logger = logging.getLogger(__name__)
+
+# Формат общий с etl/utils/bloom.py: фильтры строит ETL
+MAGIC = b'BF1'
+HEADER = struct.Struct('>QB')
+
+
+class BloomFilter:
+    """Фильтр Блума идентификаторов документов индекса"""
+
+    def __init__(self, size: int, hashes: int,
+                 bits: Optional[bytearray] = None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def create(cls, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2),
+                   8)
+        hashes = max(round(size / capacity * math.log(2)), 1)
+        return cls(size, hashes)
+
+    def positions(self, item: str) -> Iterator[int]:
+        # Двойное хеширование: k позиций из двух половин одного хеша
+        digest = xxhash.xxh3_128_intdigest(item)
+        first, second = digest >> 64, digest & 0xFFFFFFFFFFFFFFFF
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(item))
+
+    def dumps(self) -> bytes:
+        return MAGIC + HEADER.pack(self.size, self.hashes) + self.bits
+
+    @classmethod
+    def loads(cls, data: bytes):
+        if not data.startswith(MAGIC):
+            raise ValueError('Not a bloom filter')
+        size, hashes = HEADER.unpack_from(data, len(MAGIC))
+        return cls(size, hashes, bytearray(data[len(MAGIC) + HEADER.size:]))
+
+
+# Фильтры индексов, загруженные из кэша
+filters: dict = {}
+
+
+async def load(cache: AbstractCache, index: str) -> None:
+    data = await cache.get_bloom(index)
+    if not data:
+        # Без фильтра идентификаторы не отсекаются
+        filters.pop(index, None)
+        return
+    try:
+        filters[index] = BloomFilter.loads(data)
+    except ValueError:
+        logger.exception('Bloom filter of %s is broken', index)
+        filters.pop(index, None)
+        return
+    logger.info('Bloom filter of %s loaded', index)
+
+
+async def load_all(cache: AbstractCache) -> None:
+    for index in config.ELASTIC_INDEX.values():
+        await load(cache, index)
+
+
+async def track(cache: AbstractCache, interval: float) -> None:
+    # Фильтры перечитываются периодически: сообщение о созданных
+    # документах или о новом фильтре могло не дойти до процесса
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_all(cache)
+        except Exception:
+            logger.exception('Reloading bloom filters failed')
+
+
+def add(index: str, ids: Iterable[str]) -> None:
+    # Документы, созданные после построения фильтра
+    bloom = filters.get(index)
+    if bloom is not None:
+        for id in ids:
+            bloom.add(id)
+
+
+def might_contain(index: str, id: str) -> bool:
+    bloom = filters.get(index)
+    return bloom is None or id in bloom
+
+
+task: Optional[asyncio.Task] = None
@@ -1,11 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Union
+from typing import Iterable, List, Optional, Tuple, Union
+
+# Запись для set_many: ключ, данные, теги и срок жизни (None - по умолчанию)
+CacheItem = Tuple[str, bytes, Iterable[str], Optional[int]]
 
 
 class AbstractCache(ABC):
 
     @abstractmethod
-    async def set(self, key: str, data: Union[str, bytes]) -> None:
+    async def set(self, key: str, data: Union[str, bytes],
+                  expire: Optional[int] = None,
+                  tags: Iterable[str] = ()) -> None:
+        """tags - теги, при сбросе которых удаляется и запись"""
         pass
 
     @abstractmethod
@@ -13,7 +19,105 @@ class AbstractCache(ABC):
         pass
 
     @abstractmethod
-    async def get_key(self, prefix: str, query: Union[str, dict]) -> str:
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Данные записей в порядке ключей, None для отсутствующих"""
+        pass
+
+    @abstractmethod
+    async def set_many(self, items: Iterable[CacheItem]) -> None:
+        """items - ключ, данные, теги и срок жизни каждой записи"""
+        pass
+
+    @abstractmethod
+    async def get_with_ttl(
+            self, key: str) -> Tuple[Optional[bytes], Optional[float]]:
+        """Данные и оставшееся время жизни записи в секундах"""
+        pass
+
+    @abstractmethod
+    async def get_key(self, prefix: str, query: Union[str, dict],
+                      version: str = '') -> str:
+        """
+        Ключ включает поколение индекса prefix и версию схемы данных:
+        при их смене старые записи становятся недоступны и истекают сами
+        """
+        pass
+
+    @abstractmethod
+    async def get_generation(self, index: str) -> int:
+        pass
+
+    @abstractmethod
+    def set_generation(self, index: str, generation: int) -> None:
+        pass
+
+    @abstractmethod
+    async def get_revision(self, index: str) -> int:
+        """
+        Ревизия индекса, меняется при каждом изменении его документов.
+        Входит в ключи записей, зависящих от всего индекса
+        """
+        pass
+
+    @abstractmethod
+    def set_revision(self, index: str, revision: int) -> None:
+        pass
+
+    @abstractmethod
+    async def get_bloom(self, index: str) -> Optional[bytes]:
+        """Фильтр Блума идентификаторов индекса, построенный ETL"""
+        pass
+
+    @abstractmethod
+    async def incr_popular(self, index: str, counts: dict) -> None:
+        """Добавляет к счетчикам запросов объектов индекса"""
+        pass
+
+    @abstractmethod
+    async def get_popular(self, index: str, limit: int) -> List[str]:
+        """Идентификаторы самых запрашиваемых объектов индекса"""
+        pass
+
+    @abstractmethod
+    async def lock(self, name: str, expire: int) -> bool:
+        """Захватывает блокировку на expire секунд, если она свободна"""
+        pass
+
+    @abstractmethod
+    async def reserve_pit(self, session: str, expire: int, limit: int) -> bool:
+        """
+        Занимает место для сессии обхода на expire секунд,
+        если открытых сессий меньше limit (0 - без ограничения)
+        """
+        pass
+
+    @abstractmethod
+    async def set_pit(self, session: str, pit_id: str, expire: int) -> None:
+        """Сохраняет снимок индекса сессии обхода страниц"""
+        pass
+
+    @abstractmethod
+    async def get_pit(self, session: str, expire: int) -> Optional[str]:
+        """Снимок индекса сессии, срок жизни сессии продлевается"""
+        pass
+
+    @abstractmethod
+    async def delete_pit(self, session: str) -> None:
+        """Удаляет сессию и освобождает ее место"""
+        pass
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Удаляет записи с указанными тегами, возвращает их количество"""
+        pass
+
+    @abstractmethod
+    async def subscribe(self, channel: str):
+        pass
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Сбрасывает состояние процесса, которое обновляется сообщениями"""
         pass
 
     @abstractmethod
@@ -0,0 +1,92 @@
+import lzma
+import zlib
+from typing import Callable, Dict, NamedTuple, Optional
+
+from core import config
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Codec(NamedTuple):
+    name: str
+    header: bytes
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def identity(data: bytes) -> bytes:
+    return data
+
+
+# Первый байт записи определяет формат. Байты заголовков не совпадают
+# с первым байтом JSON, поэтому записи без заголовка читаются как есть
+CODECS: Dict[str, Codec] = {
+    'raw': Codec('raw', b'\x00', identity, identity),
+    'zlib': Codec('zlib', b'\x01',
+                  lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': Codec('lzma', b'\x02', lzma.compress, lzma.decompress),
+}
+if lz4 is not None:
+    CODECS['lz4'] = Codec('lz4', b'\x03',
+                          lz4.frame.compress, lz4.frame.decompress)
+if zstandard is not None:
+    CODECS['zstd'] = Codec('zstd', b'\x04',
+                           zstandard.ZstdCompressor().compress,
+                           zstandard.ZstdDecompressor().decompress)
+
+HEADERS: Dict[int, Codec] = {
+    codec.header[0]: codec for codec in CODECS.values()}
+
+
+def get_codec(name: str) -> Codec:
+    # Недоступный необязательный кодек заменяется на zlib
+    return CODECS.get(name) or CODECS['zlib']
+
+
+def encode(data: bytes, codec: Optional[str] = None,
+           threshold: Optional[int] = None) -> bytes:
+    # Сжимаются только записи не меньше порога,
+    # остальные сохраняются с заголовком raw
+    if threshold is None:
+        threshold = config.CACHE_COMPRESS_MIN_BYTES
+    if len(data) < threshold:
+        return CODECS['raw'].header + data
+    codec = get_codec(codec or config.CACHE_CODEC)
+    compressed = codec.compress(data)
+    if len(compressed) >= len(data):
+        # Уже сжатые данные, например готовые варианты ответов
+        return CODECS['raw'].header + data
+    return codec.header + compressed
+
+
+def decode(data: Optional[bytes]) -> Optional[bytes]:
+    if not data:
+        return data
+    codec = HEADERS.get(data[0])
+    if codec is None:
+        return data
+    return codec.decompress(data[1:])
+
+
+def trim(docs: Optional[dict]) -> Optional[dict]:
+    # Из ответа поиска остаются только поля, которые читает API.
+    # С filter_path elastic не передает пустой список документов
+    if not docs:
+        return docs
+    hits = docs.get('hits', {})
+    return {'hits': {
+        'total': hits.get('total'),
+        'hits': [
+            {key: hit[key] for key in ('_id', '_source', 'sort')
+             if key in hit}
+            for hit in hits.get('hits', [])
+        ],
+    }}
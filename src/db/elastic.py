@@ -1,26 +1,205 @@
+import asyncio
+from typing import List, Optional, Tuple
+
 import backoff
-from elasticsearch import AsyncElasticsearch, ConnectionError
+from core import config
+from core.metrics import metrics
+from elasticsearch import AsyncElasticsearch, ConnectionError, NotFoundError
+from elasticsearch.exceptions import HTTP_EXCEPTIONS, TransportError
 
 from .storage import AbstractStorage
 
+# Из ответа поиска нужны только документы, их число и значения
+# сортировки, остальное elastic не передает
+SEARCH_FILTER_PATH = ','.join([
+    'hits.total', 'hits.hits._id', 'hits.hits._source', 'hits.hits.sort',
+    'pit_id',
+])
+# Из ответа подсказок нужны только найденные документы
+SUGGEST_FILTER_PATH = ','.join([
+    'suggest.*.options._id', 'suggest.*.options._source',
+])
+MSEARCH_FILTER_PATH = ','.join([
+    'responses.status', 'responses.error',
+    *(f'responses.{path}' for path in SEARCH_FILTER_PATH.split(',')),
+])
+
+# Параметры поиска, которые переносятся в тело запроса _msearch
+MSEARCH_PARAMS = {'index', 'body', 'sort', 'size', 'from_',
+                  '_source_includes', 'track_total_hits', 'filter_path'}
+
+
+def to_msearch(query: dict) -> Optional[Tuple[dict, dict]]:
+    # Заголовок и тело запроса в _msearch или None,
+    # если поиск нужно выполнить отдельно
+    body = dict(query.get('body') or {})
+    if (set(query) - MSEARCH_PARAMS or 'pit' in body
+            or query.get('filter_path') != SEARCH_FILTER_PATH):
+        return None
+    if query.get('sort'):
+        body['sort'] = [
+            {field: order} if order else field
+            for field, _, order in (
+                item.partition(':') for item in query['sort'].split(','))
+        ]
+    for param, key in (('size', 'size'), ('from_', 'from'),
+                       ('track_total_hits', 'track_total_hits')):
+        if param in query:
+            body[key] = query[param]
+    if query.get('_source_includes'):
+        body['_source'] = query['_source_includes'].split(',')
+    return {'index': query['index']}, body
+
+
+class SearchBatcher:
+    """
+    Поиски, пришедшие в течение window секунд, но не больше max_size,
+    отправляются одним запросом _msearch. Каждый вызывающий получает
+    свой ответ или свою ошибку: ошибка одного поиска не влияет на другие
+    """
+
+    def __init__(self, client: AsyncElasticsearch,
+                 window: float, max_size: int):
+        self.client = client
+        self.window = window
+        self.max_size = max_size
+        self.pending: List[Tuple[dict, dict, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # Отправляемые пачки, чтобы задачи не удалил сборщик мусора
+        self.sending: set = set()
+
+    async def search(self, header: dict, body: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((header, body, future))
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self.send(batch))
+            self.sending.add(task)
+            task.add_done_callback(self.sending.discard)
+
+    @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
+    async def msearch(self, body: list) -> dict:
+        return await self.client.msearch(
+            body=body, filter_path=MSEARCH_FILTER_PATH)
+
+    async def send(self, batch: list) -> None:
+        metrics.observe('elastic.msearch.size', len(batch))
+        body = [part for header, search, _ in batch
+                for part in (header, search)]
+        try:
+            responses = (await self.msearch(body))['responses']
+            if len(responses) != len(batch):
+                raise TransportError(
+                    500, 'msearch_responses',
+                    f'{len(responses)} responses to {len(batch)} searches')
+            for (*_, future), response in zip(batch, responses):
+                if future.done():
+                    continue
+                if 'error' in response:
+                    status = response.get('status', 500)
+                    error = response['error']
+                    error_class = HTTP_EXCEPTIONS.get(status, TransportError)
+                    future.set_exception(error_class(
+                        status, error.get('type', 'unknown'), error))
+                else:
+                    future.set_result(response)
+        except Exception as error:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            # Отправка отменена (например, при остановке): вызывающие
+            # получают отмену, а не ждут ответа бесконечно
+            for *_, future in batch:
+                if not future.done():
+                    future.cancel()
+
 
 class ElasticStorage(AbstractStorage):
     @classmethod
     async def create(cls, hosts):
         self = ElasticStorage()
         self.client = AsyncElasticsearch(hosts=hosts)
+        if config.ELASTIC_MSEARCH_WINDOW:
+            self.batcher = SearchBatcher(
+                self.client, config.ELASTIC_MSEARCH_WINDOW / 1000,
+                config.ELASTIC_MSEARCH_MAX)
         return self
 
     def __init__(self):
         self.client: AsyncElasticsearch = None
+        self.batcher: Optional[SearchBatcher] = None
 
     @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
-    async def get(self, index: str, id: str) -> dict:
-        return await self.client.get(index, id)
+    async def get(self, index: str, id: str, **params) -> dict:
+        return await self.client.get(index, id, **params)
 
     @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
+    async def mget(self, index: str, ids: list) -> dict:
+        return await self.client.mget(body={'ids': ids}, index=index)
+
     async def search(self, **query) -> dict:
+        if 'pit' in query.get('body', {}):
+            # Индекс запроса по снимку задан самим снимком
+            query.pop('index', None)
+        query.setdefault('filter_path', SEARCH_FILTER_PATH)
+        item = self.batcher and to_msearch(query)
+        if item:
+            return await self.batcher.search(*item)
+        return await self.search_one(**query)
+
+    @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
+    async def search_one(self, **query) -> dict:
         return await self.client.search(**query)
 
+    @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
+    async def count(self, index: str, body: dict) -> dict:
+        return await self.client.count(body=body, index=index)
+
+    @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
+    async def suggest(self, index: str, field: str, prefix: str,
+                      size: int, **params) -> list:
+        # Completion suggester ищет по префиксу в памяти, без поиска
+        # по документам: size=0 отключает обычную выдачу
+        body = {'suggest': {'suggest': {
+            'prefix': prefix,
+            'completion': {'field': field, 'size': size},
+        }}}
+        response = await self.client.search(
+            index=index, body=body, size=0,
+            filter_path=SUGGEST_FILTER_PATH, **params)
+        suggest = response.get('suggest', {}).get('suggest') or [{}]
+        return suggest[0].get('options', [])
+
+    # Клиент 7.9 не знает API point in time, запросы отправляются напрямую
+    @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
+    async def open_pit(self, index: str, keep_alive: str) -> str:
+        response = await self.client.transport.perform_request(
+            'POST', f'/{index}/_pit', params={'keep_alive': keep_alive})
+        return response['id']
+
+    @backoff.on_exception(backoff.expo, ConnectionError, max_tries=10)
+    async def close_pit(self, pit_id: str) -> None:
+        try:
+            await self.client.transport.perform_request(
+                'DELETE', '/_pit', body={'id': pit_id})
+        except NotFoundError:
+            # Снимок уже закрыт по истечении keep_alive
+            pass
+
     async def close(self) -> None:
+        if self.batcher is not None:
+            self.batcher.flush()
+            await asyncio.gather(*self.batcher.sending)
         await self.client.close()
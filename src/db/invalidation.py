@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+import backoff
+import orjson
+
+from db import bloom, policy
+from db.cache import AbstractCache
+from db.tags import changed_tags
+
+logger = logging.getLogger(__name__)
+
+
+@backoff.on_exception(backoff.expo, Exception, max_value=30)
+async def subscribe(cache: AbstractCache, channel_name: str):
+    return await cache.subscribe(channel_name)
+
+
+async def resync(cache: AbstractCache) -> None:
+    # Пока подписки не было, сообщения могли быть пропущены:
+    # локальные записи сбрасываются, поколения и фильтры Блума
+    # читаются заново
+    cache.reset()
+    await bloom.load_all(cache)
+
+
+async def receive(cache: AbstractCache, channel,
+                  warm: Optional[Callable[[], None]] = None) -> None:
+    # Обрабатывает сообщения, пока канал открыт
+    while await channel.wait_message():
+        try:
+            message = orjson.loads(await channel.get())
+            if 'warm' in message:
+                if warm is not None:
+                    warm()
+                continue
+            if 'generation' in message:
+                cache.set_generation(message['index'], message['generation'])
+                logger.info('Cache generation of %s switched to %s',
+                            message['index'], message['generation'])
+                continue
+            if 'bloom' in message:
+                await bloom.load(cache, message['index'])
+                continue
+            if 'revision' in message:
+                cache.set_revision(message['index'], message['revision'])
+            bloom.add(message['index'], message.get('created', ()))
+            policy.changes.record(message['index'])
+            tags = changed_tags(message['index'], message['ids'],
+                                message.get('created', ()))
+            count = await cache.invalidate_tags(tags)
+            logger.info('Invalidated %s cache entries of %s',
+                        count, message['index'])
+        except Exception:
+            logger.exception('Cache invalidation failed')
+
+
+async def listen(cache: AbstractCache, channel_name: str,
+                 warm: Optional[Callable[[], None]] = None) -> None:
+    # Получает от ETL идентификаторы измененных документов
+    # и новую ревизию индекса и сбрасывает зависящие от них записи кэша,
+    # а также новые поколения ключей индексов и фильтры Блума.
+    # По окончании цикла ETL запускает прогрев кэша warm.
+    # При разрыве соединения канал закрывается, подписка возобновляется
+    channel = await subscribe(cache, channel_name)
+    while True:
+        await receive(cache, channel, warm)
+        logger.warning('Cache invalidation channel %s closed, resubscribing',
+                       channel_name)
+        channel = await subscribe(cache, channel_name)
+        try:
+            await resync(cache)
+        except Exception:
+            logger.exception('Cache resync failed')
+
+
+task: Optional[asyncio.Task] = None
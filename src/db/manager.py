@@ -1,49 +1,355 @@
-from typing import Optional
+import asyncio
+import logging
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
 
 import orjson
+from core import config
+from core.metrics import metrics
 from elasticsearch import NotFoundError
+from models.base import schema_version
 
+from db import bloom, pit
 from db.cache import get_cache
+from db.codec import trim
+from db.policy import CachePolicy, get_policy
 from db.storage import get_storage
+from db.tags import doc_tag
+
+logger = logging.getLogger(__name__)
+
+# Запись кэша об отсутствии документа
+MISSING = orjson.dumps(None)
 
 
 class DataManager:
+    # Выполняющиеся запросы к хранилищу по ключу кеша
+    inflight: dict = {}
+    # Поле подсказок поиска (completion) или None
+    suggest_field: Optional[str] = None
 
     @classmethod
-    async def get(cls, id: str) -> Optional[dict]:
-        storage = await get_storage()
+    def get_policy(cls, kind: Optional[str] = None) -> CachePolicy:
+        return get_policy(cls.index, kind)
+
+    @classmethod
+    async def get_key(cls, query, index: Optional[str] = None) -> str:
+        # index - индекс, от всех документов которого зависит запись:
+        # с ревизией индекса в версии ключа записи прошлых ревизий
+        # больше не читаются и истекают сами
+        cache = await get_cache()
+        version = schema_version(cls.model)
+        if index:
+            version += f'.{await cache.get_revision(index)}'
+        return await cache.get_key(cls.index, query, version=version)
+
+    @classmethod
+    def start(cls, key: str, loader: Callable[[], Awaitable]):
+        metrics.incr(f'manager.loads.{cls.index}')
+        future = asyncio.ensure_future(loader())
+        DataManager.inflight[key] = future
+        future.add_done_callback(lambda _: cls.done(key, future))
+        return future
+
+    @classmethod
+    def done(cls, key: str, future: asyncio.Future) -> None:
+        DataManager.inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning('Loading %s failed: %r', key, future.exception())
+
+    @classmethod
+    async def coalesce(cls, key: str, loader: Callable[[], Awaitable]):
+        # Одновременные промахи по одному ключу ждут один общий запрос
+        # к хранилищу и получают его результат или исключение
+        future = DataManager.inflight.get(key)
+        if future is not None:
+            metrics.incr(f'manager.coalesced.{cls.index}')
+        else:
+            future = cls.start(key, loader)
+        return await asyncio.shield(future)
+
+    @classmethod
+    def revalidate(cls, key: str, loader: Callable[[], Awaitable]) -> None:
+        # Обновляет устаревшую запись в фоне одной задачей на ключ
+        if key not in DataManager.inflight:
+            metrics.incr(f'manager.revalidate.{cls.index}')
+            cls.start(key, loader)
+
+    @classmethod
+    async def fetch(cls, key: str, loader: Callable[[], Awaitable],
+                    kind: str = 'detail'):
         cache = await get_cache()
         # Пытаемся получить данные из кеша, потому что оно работает быстрее
-        key = await cache.get_key(cls.index, id)
-        instance = await cache.get(key) or None
-        if not instance:
-            # Если экземпляра нет в кеше, то ищем его в базе
-            try:
-                doc = await storage.get(cls.index, id)
-                if not doc:
-                    # Если он отсутствует в базе, значит,
-                    # экземпляра вообще нет в базе
-                    return None
-                # Сохраняем экземпляр в кеш
-                instance = doc['_source']
-                await cache.set(key, orjson.dumps(instance))
-                return instance
-            except NotFoundError:
-                return None
-        return orjson.loads(instance)
-
-    @classmethod
-    async def search(cls, **query):
+        data, ttl = await cache.get_with_ttl(key)
+        if not data:
+            return await cls.coalesce(key, loader)
+        if (ttl is not None and ttl < cls.get_policy(kind).stale
+                and data != MISSING):
+            # Мягкий срок истек: отдаем устаревшие данные
+            # и обновляем их в фоне
+            metrics.incr(f'manager.stale.{cls.index}')
+            cls.revalidate(key, loader)
+        return orjson.loads(data)
+
+    @classmethod
+    async def store(cls, key: str, data, tags: Iterable[str] = (),
+                    expire: Optional[int] = None,
+                    kind: str = 'detail') -> None:
+        cache = await get_cache()
+        expire = expire or cls.get_policy(kind).expire
+        await cache.set(key, orjson.dumps(data), expire=expire, tags=tags)
+
+    @classmethod
+    def might_exist(cls, id: str) -> bool:
+        # Идентификаторы, которых точно нет в индексе,
+        # отсекаются фильтром Блума без обращения к кэшу и хранилищу
+        if bloom.might_contain(cls.index, id):
+            return True
+        metrics.incr(f'manager.bloom.rejected.{cls.index}')
+        return False
+
+    @classmethod
+    async def get(cls, id: str,
+                  fields: Optional[str] = None) -> Optional[dict]:
+        # fields - только эти поля документа, такая проекция
+        # хранится в кэше отдельно от документа целиком
+        if not cls.might_exist(id):
+            return None
+        key = await cls.get_key({'id': id, 'fields': fields} if fields else id)
+        return await cls.fetch(key, lambda: cls.load(key, id, fields))
+
+    @classmethod
+    async def load(cls, key: str, id: str,
+                   fields: Optional[str] = None) -> Optional[dict]:
         storage = await get_storage()
+        params = {'_source_includes': fields} if fields else {}
+        try:
+            doc = await storage.get(cls.index, id, **params)
+        except NotFoundError:
+            doc = None
+        if not doc:
+            # Если он отсутствует в базе, значит,
+            # экземпляра вообще нет в базе. Отсутствие запоминается
+            # ненадолго и сбрасывается при создании документа
+            policy = cls.get_policy('detail')
+            await cls.store(key, None, tags={doc_tag(cls.index, id)},
+                            expire=policy.spread(policy.negative))
+            return None
+        # Сохраняем экземпляр в кеш
+        instance = doc['_source']
+        await cls.store(key, instance, tags={doc_tag(cls.index, id)})
+        return instance
+
+    @classmethod
+    async def get_many(cls, ids: List[str]) -> List[Optional[dict]]:
+        # Один MGET в кэш, один _mget в хранилище для промахов
+        # и конвейерная запись результата обратно в кэш
+        ids = list(dict.fromkeys(ids))
+        known = [id for id in ids if cls.might_exist(id)]
+        keys = [await cls.get_key(id) for id in known]
         cache = await get_cache()
-        print(query)
-        key = await cache.get_key(cls.index, query)
-        queryset = await cache.get(key) or None
-        if not queryset:
-            try:
-                docs = await storage.search(**query)
-                await cache.set(key, orjson.dumps(docs))
-                return docs
-            except NotFoundError:
-                return None
-        return orjson.loads(queryset)
+        # Запомненное отсутствие документа тоже попадание: None
+        found = {id: orjson.loads(data)
+                 for id, data in zip(known, await cache.get_many(keys))
+                 if data}
+        missed = [id for id in known if id not in found]
+        metrics.incr(f'manager.many.hit.{cls.index}', len(found))
+        metrics.incr(f'manager.many.miss.{cls.index}', len(missed))
+        if missed:
+            found.update(await cls.load_many(dict(zip(known, keys)), missed))
+        return [found.get(id) for id in ids]
+
+    @classmethod
+    async def load_many(cls, keys: dict, ids: List[str]) -> dict:
+        storage = await get_storage()
+        try:
+            docs = (await storage.mget(cls.index, ids))['docs']
+        except NotFoundError:
+            docs = []
+        found = {doc['_id']: doc['_source']
+                 for doc in docs if doc.get('found')}
+        # Найденные и отсутствующие документы записываются одним
+        # конвейером, срок каждой записи со своей случайной добавкой
+        policy = cls.get_policy('detail')
+        items = [
+            (keys[id], orjson.dumps(found[id]), {doc_tag(cls.index, id)},
+             policy.expire)
+            if id in found else
+            (keys[id], MISSING, {doc_tag(cls.index, id)},
+             policy.spread(policy.negative))
+            for id in ids
+        ]
+        cache = await get_cache()
+        await cache.set_many(items)
+        return found
+
+    @classmethod
+    async def search(cls, kind: str = 'list', tags: Iterable[str] = (),
+                     **query):
+        # kind - вид запроса API, от него зависят сроки хранения.
+        # tags - теги документов, от которых зависит сам запрос,
+        # например документа со списком связанных
+        key = await cls.get_key(query, query['index'])
+        return await cls.fetch(
+            key, lambda: cls.load_search(key, query, kind, tags), kind)
+
+    @classmethod
+    async def get_count_key(cls, query: dict) -> str:
+        # Число документов зависит только от индекса и условий отбора,
+        # но не от страницы и сортировки
+        return await cls.get_key(
+            {'count': query['index'], 'query': query['body'].get('query')},
+            query['index'])
+
+    @classmethod
+    async def search_hits(cls, query: dict,
+                          tags: Iterable[str] = ()) -> dict:
+        # Число найденных документов считается один раз для условий
+        # отбора, следующие страницы берут его из кэша. Точно считается
+        # не больше TRACK_TOTAL_HITS документов, дальше - нижняя граница.
+        # Ревизия индекса в ключе сбрасывает число при любом изменении
+        cache = await get_cache()
+        count_key = await cls.get_count_key(query)
+        total = await cache.get(count_key)
+        storage = await get_storage()
+        docs = await storage.search(
+            **query,
+            track_total_hits=False if total else config.TRACK_TOTAL_HITS)
+        if total:
+            metrics.incr(f'manager.count.hit.{cls.index}')
+            docs.setdefault('hits', {})['total'] = orjson.loads(total)
+        else:
+            await cls.store(count_key, docs['hits']['total'], tags=tags,
+                            kind='count')
+        return docs
+
+    @classmethod
+    async def get_count(cls, query: dict, tags: Iterable[str] = ()) -> int:
+        # Точное число документов: из кэша, если его уже посчитал поиск
+        # или прошлый HEAD, иначе через _count, без поиска.
+        # Нижняя граница из кэша уточняется
+        cache = await get_cache()
+        count_key = await cls.get_count_key(query)
+        total = await cache.get(count_key)
+        if total:
+            total = orjson.loads(total)
+            if total['relation'] == 'eq':
+                metrics.incr(f'manager.count.hit.{cls.index}')
+                return total['value']
+        storage = await get_storage()
+        body = {'query': query['body'].get('query') or {'match_all': {}}}
+        count = (await storage.count(query['index'], body))['count']
+        await cls.store(count_key, {'value': count, 'relation': 'eq'},
+                        tags=tags, kind='count')
+        return count
+
+    @classmethod
+    async def choose_phase(
+            cls, query: dict, kind: str = 'list',
+            tags: Iterable[str] = ()) -> Tuple[dict, Optional[dict]]:
+        # Двухфазный поиск: точный запрос выполняется обычным поиском
+        # с ограниченным подсчетом, запасной нечеткий - только если
+        # точный нашел меньше threshold документов. Выбор зависит только
+        # от условий отбора, поэтому одинаков для всех страниц и для HEAD:
+        # число документов точного запроса берется из кэша, если его уже
+        # посчитал поиск. Возвращает выбранный запрос и результат точного
+        # поиска, если он выбран и уже выполнен
+        query = dict(query)
+        fallback = query.pop('fallback', None)
+        if fallback is None:
+            return query, None
+        cache = await get_cache()
+        total = await cache.get(await cls.get_count_key(query))
+        docs = None
+        if total:
+            count = orjson.loads(total)['value']
+        else:
+            # Страница обхода по снимку выбирает запрос обычным поиском
+            exact = {key: value for key, value in query.items()
+                     if key != 'session'}
+            docs = await cls.search(kind, tags, **exact)
+            count = docs['hits']['total']['value'] if docs else 0
+        if count >= fallback['threshold']:
+            metrics.incr(f'search.exact.{cls.index}')
+            return query, None if 'session' in query else docs
+        metrics.incr(f'search.fallback.{cls.index}')
+        body = {**query['body'], 'query': fallback['query']}
+        return {**query, 'body': body}, None
+
+    @classmethod
+    async def load_search(cls, key: str, query: dict, kind: str = 'list',
+                          tags: Iterable[str] = ()):
+        try:
+            docs = trim(await cls.search_hits(query, tags))
+        except NotFoundError:
+            return None
+        # Результат поиска сбрасывается при изменении документов индекса
+        # сменой ревизии в ключе, а при изменении документов tags - тегами
+        await cls.store(key, docs, tags=tags, kind=kind)
+        return docs
+
+    @classmethod
+    async def suggest(cls, prefix: str, size: int,
+                      source: Optional[str] = None) -> List[dict]:
+        # Подсказки кэшируются для каждого префикса: следующие
+        # нажатия клавиш у разных пользователей совпадают
+        key = await cls.get_key(
+            {'suggest': prefix, 'size': size, 'source': source}, cls.index)
+        return await cls.fetch(
+            key, lambda: cls.load_suggest(key, prefix, size, source),
+            'suggest')
+
+    @classmethod
+    async def load_suggest(cls, key: str, prefix: str, size: int,
+                           source: Optional[str] = None) -> List[dict]:
+        storage = await get_storage()
+        params = {'_source_includes': source} if source else {}
+        options = await storage.suggest(
+            cls.index, cls.suggest_field, prefix, size, **params)
+        data = [option['_source'] for option in options]
+        await cls.store(key, data, kind='suggest')
+        return data
+
+    @classmethod
+    async def search_session(cls, kind: str = 'list',
+                             session: Optional[str] = None,
+                             tags: Iterable[str] = (), **query):
+        # Страница обхода по снимку индекса, без кэша.
+        # Результат дополняется сессией для ссылки на следующую страницу
+        pit_id = session and await pit.get_session(session)
+        if session and not pit_id:
+            return await cls.search_expired(kind, query, tags)
+        if not session:
+            opened = await pit.open_session(query['index'])
+            if opened is None:
+                # Обход без снимка: порядок страниц сохраняется
+                # благодаря id в сортировке
+                return await cls.search(kind, tags, **query)
+            session, pit_id = opened
+        body = {**query['body'],
+                'pit': {'id': pit_id, 'keep_alive': pit.get_keep_alive()}}
+        try:
+            docs = await cls.search_hits({**query, 'body': body}, tags)
+        except NotFoundError:
+            # Снимок закрыт elastic раньше, чем истекла сессия
+            await pit.close_session(session, pit_id)
+            return await cls.search_expired(kind, query, tags)
+        if docs.get('pit_id', pit_id) != pit_id:
+            pit_id = docs['pit_id']
+            await pit.update_session(session, pit_id)
+        docs = trim(docs)
+        if len(docs['hits']['hits']) < query['size']:
+            # Последняя страница, снимок больше не нужен
+            await pit.close_session(session, pit_id)
+            session = None
+        return {**docs, 'session': session}
+
+    @classmethod
+    async def search_expired(cls, kind: str, query: dict,
+                             tags: Iterable[str] = ()):
+        # Обход продолжается без снимка: порядок страниц сохраняется
+        # благодаря id в сортировке, но изменения индекса станут видны
+        metrics.incr(f'pit.expired.{cls.index}')
+        fields = query['sort'].count(',') + 1
+        body = query['body']
+        body = {**body, 'search_after': body['search_after'][:fields]}
+        return await cls.search(kind, tags, **{**query, 'body': body})
@@ -0,0 +1,216 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Iterable, List, Optional, Tuple, Union
+
+from core import config
+from core.metrics import metrics
+
+from db.cache import AbstractCache, CacheItem
+from db.tags import tag_index
+
+
+class LRUSegment:
+    """LRU-сегмент локального кэша с ограничением по числу и объему записей"""
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[float]]:
+        item = self.items.get(key)
+        if item is None:
+            return None, None
+        expires, data, deadline = item
+        now = monotonic()
+        if expires < now:
+            self.delete(key)
+            return None, None
+        self.items.move_to_end(key)
+        return data, deadline - now if deadline is not None else None
+
+    def set(self, key: str, data: bytes, ttl: float,
+            expire: Optional[float] = None) -> None:
+        # expire - оставшийся срок жизни записи в основном кэше
+        self.delete(key)
+        if len(data) > self.max_bytes:
+            return
+        now = monotonic()
+        deadline = None
+        if expire is not None:
+            ttl = min(ttl, expire)
+            deadline = now + expire
+        self.items[key] = (now + ttl, data, deadline)
+        self.size += len(data)
+        while (len(self.items) > self.max_items
+               or self.size > self.max_bytes):
+            _, (_, evicted, _) = self.items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def delete(self, key: str) -> None:
+        item = self.items.pop(key, None)
+        if item is not None:
+            self.size -= len(item[1])
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.size = 0
+
+
+class MemoryCache(AbstractCache):
+    """
+    Локальный кэш процесса (L1) перед основным кэшем (L2).
+    Горячие ключи отдаются из памяти без обращения к сети,
+    емкость задается отдельно для каждого префикса ключей (индекса)
+    """
+
+    def __init__(self,
+                 backend: AbstractCache,
+                 ttl: float = config.CACHE_LOCAL_TTL,
+                 max_items: int = config.CACHE_LOCAL_MAX_ITEMS,
+                 max_bytes: int = config.CACHE_LOCAL_MAX_BYTES,
+                 capacity: Optional[dict] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.capacity = capacity or config.CACHE_LOCAL_CAPACITY
+        self.segments: dict = {}
+
+    @staticmethod
+    def get_prefix(key: str) -> str:
+        return key.split(':', 1)[0]
+
+    def get_segment(self, key: str) -> LRUSegment:
+        prefix = self.get_prefix(key)
+        segment = self.segments.get(prefix)
+        if segment is None:
+            capacity = self.capacity.get(prefix) or {}
+            segment = LRUSegment(
+                max_items=capacity.get('items', self.max_items),
+                max_bytes=capacity.get('bytes', self.max_bytes),
+            )
+            self.segments[prefix] = segment
+        return segment
+
+    async def set(self, key: str, data: Union[str, bytes],
+                  expire: Optional[int] = None,
+                  tags: Iterable[str] = ()) -> None:
+        await self.backend.set(key, data, expire=expire, tags=tags)
+        if isinstance(data, str):
+            data = data.encode()
+        self.get_segment(key).set(key, data, self.ttl, expire)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        data, _ = await self.get_with_ttl(key)
+        return data
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        # Из основного кэша запрашиваются только ключи,
+        # которых нет в памяти процесса
+        result, missed = [], []
+        for key in keys:
+            data, _ = self.get_segment(key).get(key)
+            if data is None:
+                missed.append(key)
+            result.append(data)
+            status = 'miss' if data is None else 'hit'
+            metrics.incr(f'cache.local.{status}.{self.get_prefix(key)}')
+        if not missed:
+            return result
+        found = dict(zip(missed, await self.backend.get_many(missed)))
+        for i, key in enumerate(keys):
+            data = found.get(key)
+            if data:
+                self.get_segment(key).set(key, data, self.ttl)
+                result[i] = data
+        return result
+
+    async def set_many(self, items: Iterable[CacheItem]) -> None:
+        items = list(items)
+        await self.backend.set_many(items)
+        for key, data, _, expire in items:
+            self.get_segment(key).set(key, data, self.ttl, expire)
+
+    async def get_with_ttl(
+            self, key: str) -> Tuple[Optional[bytes], Optional[float]]:
+        prefix = self.get_prefix(key)
+        segment = self.get_segment(key)
+        data, expire = segment.get(key)
+        if data is not None:
+            metrics.incr(f'cache.local.hit.{prefix}')
+            return data, expire
+        metrics.incr(f'cache.local.miss.{prefix}')
+        data, expire = await self.backend.get_with_ttl(key)
+        if data:
+            segment.set(key, data, self.ttl, expire)
+        return data, expire
+
+    async def get_key(self, prefix: str, query: Union[str, dict],
+                      version: str = '') -> str:
+        return await self.backend.get_key(prefix, query, version)
+
+    async def get_generation(self, index: str) -> int:
+        return await self.backend.get_generation(index)
+
+    def set_generation(self, index: str, generation: int) -> None:
+        # Записи прошлого поколения больше не читаются, освобождаем память
+        segment = self.segments.get(index)
+        if segment is not None:
+            segment.clear()
+        self.backend.set_generation(index, generation)
+
+    async def get_revision(self, index: str) -> int:
+        return await self.backend.get_revision(index)
+
+    def set_revision(self, index: str, revision: int) -> None:
+        self.backend.set_revision(index, revision)
+
+    async def get_bloom(self, index: str) -> Optional[bytes]:
+        return await self.backend.get_bloom(index)
+
+    async def incr_popular(self, index: str, counts: dict) -> None:
+        await self.backend.incr_popular(index, counts)
+
+    async def get_popular(self, index: str, limit: int) -> List[str]:
+        return await self.backend.get_popular(index, limit)
+
+    async def lock(self, name: str, expire: int) -> bool:
+        return await self.backend.lock(name, expire)
+
+    async def reserve_pit(self, session: str, expire: int, limit: int) -> bool:
+        return await self.backend.reserve_pit(session, expire, limit)
+
+    async def set_pit(self, session: str, pit_id: str, expire: int) -> None:
+        await self.backend.set_pit(session, pit_id, expire)
+
+    async def get_pit(self, session: str, expire: int) -> Optional[str]:
+        return await self.backend.get_pit(session, expire)
+
+    async def delete_pit(self, session: str) -> None:
+        await self.backend.delete_pit(session)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        # Сегменты индексов тегов очищаются целиком: каждый воркер
+        # получает сообщение сам, а множества тегов в Redis к этому
+        # моменту могут быть уже удалены другим воркером
+        tags = list(tags)
+        for index in {tag_index(tag) for tag in tags}:
+            segment = self.segments.get(index)
+            if segment is not None:
+                segment.clear()
+        return await self.backend.invalidate_tags(tags)
+
+    async def subscribe(self, channel: str):
+        return await self.backend.subscribe(channel)
+
+    def reset(self) -> None:
+        for segment in self.segments.values():
+            segment.clear()
+        self.backend.reset()
+
+    async def close(self) -> None:
+        for segment in self.segments.values():
+            segment.clear()
+        await self.backend.close()
@@ -0,0 +1,55 @@
+import secrets
+from typing import Optional, Tuple
+
+from core import config
+from core.metrics import metrics
+
+from db.cache import get_cache
+from db.storage import get_storage
+
+# Сессия обхода страниц по курсору - снимок индекса (point in time):
+# все страницы обхода видят индекс таким, каким он был на первой.
+# Сессия хранится в Redis, пока обход продолжается, снимок закрывается
+# на последней странице, брошенные снимки elastic закрывает сам
+# по истечении keep_alive
+
+
+def get_keep_alive() -> str:
+    return f'{config.PIT_KEEP_ALIVE}s'
+
+
+async def open_session(index: str) -> Optional[Tuple[str, str]]:
+    # None - открыто PIT_MAX_SESSIONS снимков, новый не открывается
+    session = secrets.token_urlsafe(12)
+    cache = await get_cache()
+    if not await cache.reserve_pit(session, config.PIT_KEEP_ALIVE,
+                                   config.PIT_MAX_SESSIONS):
+        metrics.incr(f'pit.rejected.{index}')
+        return None
+    try:
+        storage = await get_storage()
+        pit_id = await storage.open_pit(index, get_keep_alive())
+    except BaseException:
+        await cache.delete_pit(session)
+        raise
+    await cache.set_pit(session, pit_id, config.PIT_KEEP_ALIVE)
+    metrics.incr(f'pit.opened.{index}')
+    return session, pit_id
+
+
+async def get_session(session: str) -> Optional[str]:
+    cache = await get_cache()
+    return await cache.get_pit(session, config.PIT_KEEP_ALIVE)
+
+
+async def update_session(session: str, pit_id: str) -> None:
+    # elastic может вернуть новый идентификатор снимка
+    cache = await get_cache()
+    await cache.set_pit(session, pit_id, config.PIT_KEEP_ALIVE)
+
+
+async def close_session(session: str, pit_id: str) -> None:
+    cache = await get_cache()
+    await cache.delete_pit(session)
+    storage = await get_storage()
+    await storage.close_pit(pit_id)
@@ -0,0 +1,103 @@
+import random
+from time import monotonic
+from typing import Optional
+
+from core import config
+
+
+class CachePolicy:
+    """
+    Сроки жизни записей кэша индекса.
+    В течение ttl запись свежая, затем еще stale секунд она отдается
+    устаревшей, пока фоновая задача не обновит ее.
+    Отсутствие документа запоминается на negative секунд.
+    Сроки увеличиваются на случайную долю до jitter, чтобы записи,
+    созданные одновременно, не истекали вместе.
+    С заданным max_ttl срок подстраивается под частоту изменений
+    индекса от ETL: ttl - нижняя граница, max_ttl - верхняя
+    """
+
+    def __init__(self, index: str, ttl: int, stale: int = 0,
+                 negative: int = config.CACHE_NEGATIVE_TTL,
+                 jitter: float = config.CACHE_EXPIRE_JITTER,
+                 max_ttl: Optional[int] = None):
+        self.index = index
+        self.min_ttl = ttl
+        self.stale = stale
+        self.negative = negative
+        self.jitter = jitter
+        self.max_ttl = max_ttl
+
+    @property
+    def ttl(self) -> int:
+        interval = changes.get_interval(self.index)
+        if not self.max_ttl or interval is None:
+            return self.min_ttl
+        # Запись живет примерно половину обычного интервала
+        # между изменениями индекса
+        return int(min(max(interval / 2, self.min_ttl), self.max_ttl))
+
+    @property
+    def expire(self) -> int:
+        # Жесткий срок жизни записи в кэше
+        return self.spread(self.ttl + self.stale)
+
+    def spread(self, seconds: int) -> int:
+        return seconds + round(random.uniform(0, seconds * self.jitter))
+
+
+class ChangeRate:
+    """
+    Сглаженный интервал между изменениями индексов от ETL.
+    Сообщения одного цикла загрузки, пришедшие с промежутком
+    меньше burst секунд, считаются одним изменением
+    """
+
+    def __init__(self, weight: float = 0.3, burst: float = 5):
+        self.weight = weight
+        self.burst = burst
+        self.last: dict = {}
+        self.intervals: dict = {}
+
+    def record(self, index: str) -> None:
+        now = monotonic()
+        last = self.last.get(index)
+        self.last[index] = now
+        if last is None or now - last < self.burst:
+            return
+        interval = self.intervals.get(index)
+        if interval is None:
+            self.intervals[index] = now - last
+        else:
+            self.intervals[index] = (self.weight * (now - last)
+                                     + (1 - self.weight) * interval)
+
+    def get_interval(self, index: str) -> Optional[float]:
+        interval = self.intervals.get(index)
+        if interval is None:
+            return None
+        # Пока изменений нет, интервал растет
+        return max(interval, monotonic() - self.last[index])
+
+
+changes = ChangeRate()
+policies: dict = {}
+
+
+def get_policy(index: str, kind: Optional[str] = None) -> CachePolicy:
+    # Параметры вида запроса дополняют параметры индекса:
+    # {"genres": {"ttl": 3600, "search": {"ttl": 60}}}
+    policy = policies.get((index, kind))
+    if policy is None:
+        params = config.CACHE_POLICY.get(index) or {}
+        params = {**params, **(params.get(kind) or {})}
+        policy = CachePolicy(
+            index=index,
+            ttl=params.get('ttl', config.CACHE_EXPIRE_IN_SECONDS),
+            stale=params.get('stale', config.CACHE_STALE_IN_SECONDS),
+            negative=params.get('negative', config.CACHE_NEGATIVE_TTL),
+            jitter=params.get('jitter', config.CACHE_EXPIRE_JITTER),
+            max_ttl=params.get('max_ttl'),
+        )
+        policies[(index, kind)] = policy
+    return policy
@@ -0,0 +1,34 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from typing import Optional
+
+from db.cache import AbstractCache
+
+logger = logging.getLogger(__name__)
+
+# Запросы объектов по индексам с последнего сохранения
+hits: defaultdict = defaultdict(Counter)
+
+
+def record(index: str, id: str) -> None:
+    hits[index][id] += 1
+
+
+async def flush(cache: AbstractCache) -> None:
+    for index in list(hits):
+        await cache.incr_popular(index, hits.pop(index))
+
+
+async def track(cache: AbstractCache, interval: float) -> None:
+    # Счетчики копятся в памяти и сохраняются в кэш пачками,
+    # чтобы не добавлять запрос к Redis в каждый ответ
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush(cache)
+        except Exception:
+            logger.exception('Saving popularity counters failed')
+
+
+task: Optional[asyncio.Task] = None
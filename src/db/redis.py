@@ -1,12 +1,54 @@
-from hashlib import sha256
-from typing import Optional, Union
+from time import monotonic, time
+from typing import Iterable, List, Optional, Tuple, Union
 
 import backoff
 import orjson
+import xxhash
 from aioredis import Redis, RedisError, create_redis_pool
 from core import config
 
-from db.cache import AbstractCache
+from db.cache import AbstractCache, CacheItem
+from db.codec import decode, encode
+
+# Сохраняет запись и добавляет ее ключ в множества тегов.
+# Срок жизни тега только продлевается, чтобы тег жил не меньше
+# самой долгой из своих записей
+SET_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if redis.call('TTL', KEYS[i]) < tonumber(ARGV[2]) then
+        redis.call('EXPIRE', KEYS[i], ARGV[2])
+    end
+end
+"""
+
+# Удаляет все записи с указанными тегами и сами теги
+INVALIDATE_SCRIPT = """
+local count = 0
+for _, tag in ipairs(KEYS) do
+    for _, key in ipairs(redis.call('SMEMBERS', tag)) do
+        count = count + redis.call('DEL', key)
+    end
+    redis.call('DEL', tag)
+end
+return count
+"""
+
+# Добавляет сессию обхода в множество открытых, если в нем есть место.
+# Оценка сессии - время истечения, истекшие сессии удаляются
+RESERVE_PIT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local limit = tonumber(ARGV[4])
+if limit > 0 and redis.call('ZCARD', KEYS[1]) >= limit then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2] + ARGV[3], ARGV[1])
+return 1
+"""
+
+# Множество открытых сессий обхода
+PIT_SESSIONS = 'pit:sessions'
 
 
 class RedisCache(AbstractCache):
@@ -23,19 +65,177 @@ class RedisCache(AbstractCache):
 
     def __init__(self):
         self.redis: Redis = None
+        # Поколения индексов, прочитанные из Redis, и время их обновления
+        self.generations: dict = {}
+        # Ревизии индексов, прочитанные из Redis, и время их обновления
+        self.revisions: dict = {}
 
     @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
-    async def set(self, key: str, data: Union[str, bytes]) -> None:
-        await self.redis.set(key, data, expire=config.CACHE_EXPIRE_IN_SECONDS)
+    async def set(self, key: str, data: Union[str, bytes],
+                  expire: Optional[int] = None,
+                  tags: Iterable[str] = ()) -> None:
+        expire = expire or config.CACHE_EXPIRE_IN_SECONDS
+        if isinstance(data, str):
+            data = data.encode()
+        data = encode(data)
+        tags = list(tags)
+        if not tags:
+            await self.redis.set(key, data, expire=expire)
+            return
+        await self.redis.eval(SET_SCRIPT, keys=[key, *tags],
+                              args=[data, expire])
 
     @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
     async def get(self, key: str) -> Optional[bytes]:
-        return await self.redis.get(key) or None
+        return decode(await self.redis.get(key)) or None
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return [decode(data) or None
+                for data in await self.redis.mget(*keys)]
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def set_many(self, items: Iterable[CacheItem]) -> None:
+        # Все записи отправляются одним конвейером,
+        # у каждой записи свой срок жизни
+        pipe = self.redis.pipeline()
+        for key, data, tags, expire in items:
+            expire = expire or config.CACHE_EXPIRE_IN_SECONDS
+            pipe.eval(SET_SCRIPT, keys=[key, *tags],
+                      args=[encode(data), expire])
+        await pipe.execute()
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def get_with_ttl(
+            self, key: str) -> Tuple[Optional[bytes], Optional[float]]:
+        pipe = self.redis.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        data, ttl = await pipe.execute()
+        # Отрицательный pttl: ключа нет или у него нет срока жизни
+        return decode(data) or None, ttl / 1000 if ttl >= 0 else None
+
+    async def get_key(self, prefix: str, query: Union[str, dict],
+                      version: str = '') -> str:
+        generation = await self.get_generation(prefix)
+        # Ключи словарей сортируются, чтобы порядок параметров
+        # не влиял на ключ, хеш некриптографический и быстрый
+        str_params: bytes = orjson.dumps(query, option=orjson.OPT_SORT_KEYS)
+        _hash = xxhash.xxh3_128_hexdigest(str_params)
+        return f'{prefix}:{generation}:{version}:{_hash}'
+
+    @staticmethod
+    def get_generation_key(index: str) -> str:
+        return f'generation:{index}'
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def get_generation(self, index: str) -> int:
+        generation, refresh = self.generations.get(index, (0, 0))
+        if refresh < monotonic():
+            # Поколение меняет ETL, о смене сообщается через канал сброса
+            # кэша, а периодическое чтение страхует от пропущенных сообщений
+            generation = int(
+                await self.redis.get(self.get_generation_key(index)) or 0)
+            self.set_generation(index, generation)
+        return generation
+
+    def set_generation(self, index: str, generation: int) -> None:
+        self.generations[index] = (
+            generation, monotonic() + config.CACHE_GENERATION_REFRESH)
+
+    @staticmethod
+    def get_revision_key(index: str) -> str:
+        return f'revision:{index}'
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def get_revision(self, index: str) -> int:
+        revision, refresh = self.revisions.get(index, (0, 0))
+        if refresh < monotonic():
+            # Ревизию, как и поколение, меняет ETL и сообщает о ней
+            # через канал сброса кэша
+            revision = int(
+                await self.redis.get(self.get_revision_key(index)) or 0)
+            self.set_revision(index, revision)
+        return revision
+
+    def set_revision(self, index: str, revision: int) -> None:
+        self.revisions[index] = (
+            revision, monotonic() + config.CACHE_GENERATION_REFRESH)
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def get_bloom(self, index: str) -> Optional[bytes]:
+        # Фильтр записывает ETL без заголовка кодека
+        return await self.redis.get(f'bloom:{index}')
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def incr_popular(self, index: str, counts: dict) -> None:
+        # Хранятся только самые запрашиваемые объекты
+        key = f'popular:{index}'
+        pipe = self.redis.pipeline()
+        for id, count in counts.items():
+            pipe.zincrby(key, count, id)
+        pipe.zremrangebyrank(key, 0, -config.CACHE_POPULAR_MAX - 1)
+        await pipe.execute()
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def get_popular(self, index: str, limit: int) -> List[str]:
+        return await self.redis.zrevrange(
+            f'popular:{index}', 0, limit - 1, encoding='utf-8')
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def lock(self, name: str, expire: int) -> bool:
+        return bool(await self.redis.set(
+            f'lock:{name}', 1, expire=expire,
+            exist=self.redis.SET_IF_NOT_EXIST))
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def reserve_pit(self, session: str, expire: int, limit: int) -> bool:
+        return bool(await self.redis.eval(
+            RESERVE_PIT_SCRIPT, keys=[PIT_SESSIONS],
+            args=[session, time(), expire, limit]))
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def set_pit(self, session: str, pit_id: str, expire: int) -> None:
+        pipe = self.redis.pipeline()
+        pipe.set(f'pit:{session}', pit_id, expire=expire)
+        pipe.zadd(PIT_SESSIONS, time() + expire, session)
+        await pipe.execute()
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def get_pit(self, session: str, expire: int) -> Optional[str]:
+        # Место продлевается вместе с сессией, если она еще открыта
+        pipe = self.redis.pipeline()
+        pipe.get(f'pit:{session}', encoding='utf-8')
+        pipe.expire(f'pit:{session}', expire)
+        pipe.zadd(PIT_SESSIONS, time() + expire, session,
+                  exist=self.redis.ZSET_IF_EXIST)
+        pit_id, _, _ = await pipe.execute()
+        return pit_id
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def delete_pit(self, session: str) -> None:
+        pipe = self.redis.pipeline()
+        pipe.delete(f'pit:{session}')
+        pipe.zrem(PIT_SESSIONS, session)
+        await pipe.execute()
+
+    @backoff.on_exception(backoff.expo, RedisError, max_tries=10)
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        if not tags:
+            return 0
+        return await self.redis.eval(INVALIDATE_SCRIPT, keys=tags)
+
+    async def subscribe(self, channel: str):
+        channel, = await self.redis.subscribe(channel)
+        return channel
 
-    async def get_key(self, prefix: str, query: Union[str, dict]) -> str:
-        str_params: bytes = orjson.dumps(query)
-        _hash = sha256(str_params).hexdigest()
-        return f'{prefix}:{_hash}'
+    def reset(self) -> None:
+        # Поколения и ревизии будут прочитаны из Redis при следующем запросе
+        self.generations.clear()
+        self.revisions.clear()
 
     async def close(self) -> None:
         await self.redis.close()
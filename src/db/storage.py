@@ -7,10 +7,30 @@ class AbstractStorage(ABC):
     def get(self, index, id):
         pass
 
+    @abstractmethod
+    def mget(self, index, ids):
+        pass
+
     @abstractmethod
     def search(self, **query):
         pass
 
+    @abstractmethod
+    def count(self, index, body):
+        pass
+
+    @abstractmethod
+    def suggest(self, index, field, prefix, size, **params):
+        pass
+
+    @abstractmethod
+    def open_pit(self, index, keep_alive):
+        pass
+
+    @abstractmethod
+    def close_pit(self, pit_id):
+        pass
+
     @abstractmethod
     def close(self):
         pass
@@ -0,0 +1,25 @@
+from typing import Iterable, Set
+
+
+def doc_tag(index: str, id: str) -> str:
+    # Тег записей, содержащих документ
+    return f'tag:{index}:{id}'
+
+
+def tag_index(tag: str) -> str:
+    return tag.split(':')[1]
+
+
+def results_tags(index: str, data: dict) -> Set[str]:
+    # Теги документов из готового ответа API: списка или одного объекта
+    if 'results' in data:
+        return {doc_tag(index, str(item['id'])) for item in data['results']}
+    return {doc_tag(index, str(data['id']))}
+
+
+def changed_tags(index: str, ids: Iterable[str],
+                 created: Iterable[str] = ()) -> Set[str]:
+    # Теги, которые нужно сбросить после изменения документов индекса.
+    # Записи всего индекса (списки, поиски, число документов) тегов
+    # не имеют: их ключи включают ревизию индекса, которую меняет ETL
+    return {doc_tag(index, id) for id in [*ids, *created]}
@@ -1,12 +1,15 @@
+import asyncio
 import logging
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
-from api.v1 import films, genres, persons
+from api.v1 import films, genres, persons, search, warming
 from core import config, logger
-from db import cache, elastic, redis, storage
+from core.metrics import metrics
+from db import (bloom, cache, elastic, invalidation, memory, popularity,
+                redis, storage)
 
 app = FastAPI(
     title='Read-only API для онлайн-кинотеатра',
@@ -24,20 +27,44 @@ app = FastAPI(
 async def startup():
     cache.cache = await redis.RedisCache.create(
         (config.REDIS_HOST, config.REDIS_PORT))
+    if config.CACHE_LOCAL_TTL:
+        # Горячие ключи отдаются из памяти процесса без обращения к Redis
+        cache.cache = memory.MemoryCache(cache.cache)
+    await bloom.load_all(cache.cache)
+    bloom.task = asyncio.create_task(bloom.track(
+        cache.cache, config.CACHE_BLOOM_REFRESH))
+    invalidation.task = asyncio.create_task(invalidation.listen(
+        cache.cache, config.CACHE_INVALIDATION_CHANNEL,
+        warm=lambda: warming.start(cache.cache)))
+    popularity.task = asyncio.create_task(popularity.track(
+        cache.cache, config.CACHE_POPULAR_FLUSH))
 
     storage.db = await elastic.ElasticStorage.create(
         hosts=[f'{config.ELASTIC_HOST}:{config.ELASTIC_PORT}'])
+    # Прогрев идет в фоне и не задерживает запуск
+    warming.start(cache.cache)
 
 
 @app.on_event('shutdown')
 async def shutdown():
+    invalidation.task.cancel()
+    popularity.task.cancel()
+    bloom.task.cancel()
+    if warming.task is not None:
+        warming.task.cancel()
     await cache.cache.close()
     await storage.db.close()
 
 
+@app.get('/api/metrics', include_in_schema=False)
+async def get_metrics():
+    return metrics.snapshot()
+
+
 app.include_router(films.router, prefix='/api/v1', tags=['Фильмы'])
 app.include_router(genres.router, prefix='/api/v1', tags=['Жанры'])
 app.include_router(persons.router, prefix='/api/v1', tags=['Люди'])
+app.include_router(search.router, prefix='/api/v1', tags=['Поиск'])
 
 if __name__ == '__main__':
     uvicorn.run(
@@ -1,3 +1,6 @@
+from functools import lru_cache
+from hashlib import sha256
+
 import orjson
 from pydantic import BaseModel
 
@@ -8,6 +11,29 @@ def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
 
 
+@lru_cache()
+def schema_version(model) -> str:
+    # Короткий хеш схемы модели: при ее изменении меняются ключи кэша
+    schema = orjson.dumps(model.schema(), option=orjson.OPT_SORT_KEYS)
+    return sha256(schema).hexdigest()[:8]
+
+
+def source_paths(model, prefix: str = ''):
+    for field in model.__fields__.values():
+        nested = field.type_
+        if isinstance(nested, type) and issubclass(nested, BaseModel):
+            yield from source_paths(nested, f'{prefix}{field.alias}.')
+        else:
+            yield f'{prefix}{field.alias}'
+
+
+@lru_cache()
+def source_includes(model) -> str:
+    # Поля документа, из которых строится модель ответа, включая
+    # вложенные: остальные поля _source elastic не передает
+    return ','.join(sorted(source_paths(model)))
+
+
 class OrjsonMixin(BaseModel):
 
     class Config:
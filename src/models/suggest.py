@@ -0,0 +1,22 @@
+from typing import List
+from uuid import UUID
+
+from models.base import OrjsonMixin
+
+
+class FilmSuggestModel(OrjsonMixin):
+    """Подсказка поиска: фильм"""
+    id: UUID
+    title: str
+
+
+class PersonSuggestModel(OrjsonMixin):
+    """Подсказка поиска: человек"""
+    id: UUID
+    full_name: str
+
+
+class SuggestResponseModel(OrjsonMixin):
+    """Модель ответа API с подсказками поиска"""
+    films: List[FilmSuggestModel]
+    persons: List[PersonSuggestModel]
@@ -1,6 +1,8 @@
 from abc import ABC, abstractclassmethod
 from typing import List, Optional
 
+from core import config
+
 from .utils import RequestParams
 
 
@@ -24,10 +26,17 @@ class AbstractService(ABC):
 
 class BaseService(AbstractService):
     search_fields: Optional[List] = []
+    # Параметры двухфазного поиска, сервис может задать свои
+    fuzzy_threshold: int = config.SEARCH_FUZZY_THRESHOLD
+    prefix_length: int = config.SEARCH_PREFIX_LENGTH
+    max_expansions: int = config.SEARCH_MAX_EXPANSIONS
 
     @classmethod
     async def get_query(cls, params):
         request_params = RequestParams()
-        query = await request_params.get_query(params, cls.index,
-                                               cls.search_fields)
+        query = await request_params.get_query(
+            params, cls.index, cls.search_fields,
+            fuzzy_threshold=cls.fuzzy_threshold,
+            prefix_length=cls.prefix_length,
+            max_expansions=cls.max_expansions)
         return query
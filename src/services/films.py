@@ -9,3 +9,4 @@ class Films(DataManager, BaseService):
     index = config.ELASTIC_INDEX['films']
     model = FilmsElasticModel
     search_fields = ['title', 'description']
+    suggest_field = 'title.suggest'
@@ -9,3 +9,4 @@ class Persons(DataManager, BaseService):
     index = config.ELASTIC_INDEX['persons']
     model = PersonsElasticModel
     search_fields = ['full_name']
+    suggest_field = 'full_name.suggest'
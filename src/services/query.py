@@ -0,0 +1,57 @@
+from typing import Iterable, List, Optional
+
+import orjson
+
+
+def clause_key(clause: dict) -> bytes:
+    return orjson.dumps(clause, option=orjson.OPT_SORT_KEYS)
+
+
+class BoolQuery:
+    """
+    Запрос в elastic из независимых условий.
+    Полнотекстовый поиск выполняется в контексте оценки, фильтры -
+    в контексте фильтра: elastic не считает для них релевантность
+    и кэширует их битовые маски между запросами.
+    Фильтры и значения в них упорядочены, поэтому одни и те же
+    условия дают одно тело запроса и один ключ кэша
+    """
+
+    def __init__(self):
+        self.filters: List[dict] = []
+
+    def filter(self, clause: dict) -> 'BoolQuery':
+        if clause not in self.filters:
+            self.filters.append(clause)
+        return self
+
+    def terms(self, field: str, values: Iterable[str],
+              path: Optional[str] = None) -> 'BoolQuery':
+        # Документ подходит, если совпадает хотя бы одно значение.
+        # path - поле вложенных документов
+        values = sorted(set(values))
+        if not values:
+            return self
+        clause = ({'term': {field: values[0]}} if len(values) == 1
+                  else {'terms': {field: values}})
+        if path:
+            clause = {'nested': {'path': path, 'query': clause}}
+        return self.filter(clause)
+
+    def range(self, field: str, gte: Optional[float] = None,
+              lte: Optional[float] = None) -> 'BoolQuery':
+        bounds = {key: value for key, value in
+                  (('gte', gte), ('lte', lte)) if value is not None}
+        if bounds:
+            self.filter({'range': {field: bounds}})
+        return self
+
+    def build(self, match: Optional[dict] = None) -> dict:
+        # match - условие поиска, от которого зависит релевантность
+        filters = sorted(self.filters, key=clause_key)
+        if not filters:
+            return match or {'match_all': {}}
+        query: dict = {'filter': filters}
+        if match:
+            query['must'] = [match]
+        return {'bool': query}
@@ -1,6 +1,26 @@
 from typing import List, Optional
 
 from core import config
+from core.cursor import TIEBREAKER, InvalidCursor, decode_cursor
+from core.utils.text import normalize_text, split_values
+
+from .query import BoolQuery
+
+
+def to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def canonical_query(query: dict) -> dict:
+    # Каноническая форма запроса в elastic: без пустых параметров
+    # и параметров со значением по умолчанию
+    query = {key: value for key, value in query.items() if value is not None}
+    if not query.get('from_'):
+        query.pop('from_', None)
+    return query
 
 
 class RequestParams:
@@ -8,6 +28,9 @@ class RequestParams:
                         params: dict,
                         index: str,
                         search_fields: Optional[List] = None,
+                        fuzzy_threshold: int = config.SEARCH_FUZZY_THRESHOLD,
+                        prefix_length: int = config.SEARCH_PREFIX_LENGTH,
+                        max_expansions: int = config.SEARCH_MAX_EXPANSIONS,
                         ) -> dict:
         # Парсит параметры и формирует запрос в elastic
         _index = params.get('_index')
@@ -15,60 +38,101 @@ class RequestParams:
         query = params.get('query')
         filter_genre = params.get('filter[genre]')
         filter_role = params.get('filter[role]')
+        rating_gte = to_float(params.get('filter[imdb_rating][gte]'))
+        rating_lte = to_float(params.get('filter[imdb_rating][lte]'))
         sort = params.get('sort')
+        source = params.get('_source')
         page_number = int(params.get('page[number]') or 1)
         page_size = int(params.get('page[size]') or config.PAGE_SIZE)
+        # Курсор: глубокие страницы читаются через search_after
+        # без пересчета пропущенных документов
+        page_after = params.get('page[after]')
+
+        if query:
+            query = normalize_text(query)
 
         if not _index:
             _index = index
 
-        if not body:
-            body: dict = {'query': {'match_all': {}}}
+        # Все условия отбора объединяются в один запрос bool,
+        # а не заменяют друг друга
+        builder = BoolQuery()
+        body = dict(body or {})
+        if body.get('query'):
+            # Отбор связанных документов
+            builder.filter(body['query'])
 
         if filter_genre:
-            body = {
-                'query': {
-                    'nested': {
-                        'path': 'genre',
-                        'query': {
-                            'bool': {
-                                'must': [
-                                    {'term': {'genre.id': filter_genre}},
-                                ]
-                            }
-                        }
-                    }
-                }
-            }
+            builder.terms('genre.id', split_values(filter_genre),
+                          path='genre')
 
         if filter_role:
-            body = {'query': {'term': {'roles': filter_role}}}
+            builder.terms('roles', split_values(filter_role))
 
+        builder.range('imdb_rating', gte=rating_gte, lte=rating_lte)
+
+        match, fallback = None, None
         if query:
-            body: dict = {
-                'query': {
+            fuzzy = {
+                'multi_match': {
+                    'query': query,
+                    'fuzziness': 'auto',
+                    'prefix_length': prefix_length,
+                    'max_expansions': max_expansions,
+                    'fields': search_fields
+                }
+            }
+            match = fuzzy
+            if fuzzy_threshold:
+                # Сначала дешевый точный запрос по началу фразы,
+                # нечеткий - запасной, его выбирает менеджер данных
+                match = {
                     'multi_match': {
                         'query': query,
-                        'fuzziness': 'auto',
+                        'type': 'phrase_prefix',
+                        'max_expansions': max_expansions,
                         'fields': search_fields
                     }
                 }
-            }
+                fallback = {'query': builder.build(fuzzy),
+                            'threshold': fuzzy_threshold}
+        body['query'] = builder.build(match)
 
         sort_field = sort[0] if not isinstance(sort, str) and sort else sort
         if sort_field:
             order = 'desc' if sort_field.startswith('-') else 'asc'
             sort_field = f"{sort_field.removeprefix('-')}:{order}"
 
-        query_params = {
+        from_ = (page_number - 1) * page_size
+        if page_after is not None:
+            # Релевантность есть только у запроса с поиском,
+            # у одних фильтров порядок задает идентификатор
+            if not sort_field and match:
+                sort_field = '_score:desc'
+            sort_field = ','.join(filter(None, [sort_field, TIEBREAKER]))
+            from_ = None
+            cursor = decode_cursor(page_after) if page_after else None
+            if cursor:
+                # Курсор от другой сортировки. В снимке индекса elastic
+                # добавляет к сортировке свое поле _shard_doc
+                fields = sort_field.count(',') + 1
+                if not (fields <= len(cursor.after)
+                        <= fields + bool(cursor.session)):
+                    raise InvalidCursor(page_after)
+                body = {**body, 'search_after': cursor.after}
+
+        query_params = canonical_query({
             'index': _index,
             'body': body,
             'sort': sort_field,
             'size': page_size,
-            'from_': (page_number - 1) * page_size
-        }
+            'from_': from_,
+            '_source_includes': source,
+            'fallback': fallback,
+        })
 
-        query_params = {key: value for key, value in query_params.items()
-                        if value is not None}
+        if page_after is not None and config.PIT_KEEP_ALIVE:
+            # Сессия обхода, None - новый обход
+            query_params['session'] = cursor and cursor.session
 
         return query_params
@@ -1,5 +1,6 @@
 import asyncio
 from dataclasses import dataclass
+from http import HTTPStatus
 
 import aiohttp
 import aioredis
@@ -55,12 +56,16 @@ async def session():
 
 @pytest.fixture
 def make_get_request(session):
-    async def inner(path: str, params: dict = None) -> HTTPResponse:
+    async def inner(path: str, params: dict = None,
+                    headers: dict = None) -> HTTPResponse:
         params = params or {}
         url = build_url(config.SERVICE_URL, path)
-        async with session.get(url, params=params) as response:
+        async with session.get(url, params=params,
+                               headers=headers) as response:
+            # Ответ 304 приходит без тела
+            not_modified = response.status == HTTPStatus.NOT_MODIFIED
             return HTTPResponse(
-                body=await response.json(),
+                body=None if not_modified else await response.json(),
                 headers=response.headers,
                 status=response.status,
             )
@@ -9,10 +9,17 @@ class Settings(BaseSettings):
     SERVICE_HOST: str = os.getenv('SERVICE_HOST', '127.0.0.1')
     SERVICE_PORT: int = int(os.getenv('SERVICE_PORT', 8000))
     SERVICE_URL: str = f'http://{SERVICE_HOST}:{SERVICE_PORT}'
+    # API за nginx
+    NGINX_HOST: str = os.getenv('NGINX_HOST', '127.0.0.1')
+    NGINX_PORT: int = int(os.getenv('NGINX_PORT', 80))
+    NGINX_URL: str = f'http://{NGINX_HOST}:{NGINX_PORT}'
 
     # Настройки Redis
     REDIS_HOST: str = os.getenv('REDIS_HOST', '127.0.0.1')
     REDIS_PORT: int = int(os.getenv('REDIS_PORT', 6379))
+    CACHE_INVALIDATION_CHANNEL: str = os.getenv('CACHE_INVALIDATION_CHANNEL',
+                                                'cache:invalidate')
+    CACHE_CLIENT_MAX_AGE: int = int(os.getenv('CACHE_CLIENT_MAX_AGE', 5))
 
     # Настройки Elasticsearch
     ELASTIC_HOST: str = os.getenv('ELASTIC_HOST', '127.0.0.1')
@@ -1,12 +1,16 @@
+import asyncio
 import uuid
 from http import HTTPStatus
+from urllib.parse import parse_qsl, urlparse
 
+import orjson
 import pytest
 
 from functional.settings import config
 from functional.testdata.films.factories import FilmFactory, FilmDetailFactory
 from functional.testdata.genres.factory import GenreFactory
 from functional.testdata.films.schema import SCHEMA as films_schema
+from functional.utils.utils import build_url, decode_cache
 
 
 FILM_INDEX = config.ELASTIC_INDEX['films']
@@ -127,6 +131,77 @@ class TestFilmsAPI:
         assert fake_id != film.id
         assert response.status == HTTPStatus.NOT_FOUND
 
+    @pytest.mark.asyncio
+    async def test_film_not_modified(self, bulk, make_get_request):
+        film = FilmDetailFactory()
+        await bulk(index=FILM_INDEX, objects=[film])
+        path = self.path + film.id
+        response = await make_get_request(path)
+        etag = response.headers['ETag']
+        # Клиент хранит ответ недолго и дальше проверяет его по ETag
+        max_age = response.headers['Cache-Control'].split('max-age=')[1]
+        assert int(max_age.split(',')[0]) <= config.CACHE_CLIENT_MAX_AGE
+
+        response = await make_get_request(
+            path, headers={'If-None-Match': etag})
+        assert response.status == HTTPStatus.NOT_MODIFIED
+        assert response.headers['ETag'] == etag
+
+        response = await make_get_request(
+            path, headers={'If-None-Match': '"other"'})
+        assert response.status == HTTPStatus.OK
+        assert response.body == film.dict()
+
+    @pytest.mark.asyncio
+    async def test_films_compressed(self, bulk, make_get_request):
+        films = FilmDetailFactory.build_batch(50)
+        await bulk(index=FILM_INDEX, objects=films)
+        params = {**self.params, 'page[size]': 50}
+        headers = {'Accept-Encoding': 'gzip'}
+
+        for _ in range(2):
+            # Первый ответ сжимается при записи в кэш, второй - из кэша
+            response = await make_get_request(self.path, params, headers)
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert len(response.body['results']) == 50
+
+    @pytest.mark.asyncio
+    async def test_film_by_malformed_id(self, make_get_request):
+        response = await make_get_request(self.path + 'not-a-uuid')
+        assert response.status == HTTPStatus.NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_cache_missing_film(self, bulk, make_get_request, cache):
+        film = FilmDetailFactory()
+        path = self.path + film.id
+        response = await make_get_request(path)
+        assert response.status == HTTPStatus.NOT_FOUND
+
+        # Отсутствие фильма запомнено в кэше
+        await bulk(index=FILM_INDEX, objects=[film])
+        response = await make_get_request(path)
+        assert response.status == HTTPStatus.NOT_FOUND
+
+        await cache.flushall()
+        response = await make_get_request(path)
+        assert response.body == film.dict()
+
+    @pytest.mark.asyncio
+    async def test_films_batch(self, bulk, make_get_request):
+        films = FilmDetailFactory.build_batch(3)
+        await bulk(index=FILM_INDEX, objects=films)
+        ids = [film.id for film in films]
+        params = {'ids': ','.join([*ids, str(uuid.uuid4())])}
+
+        response = await make_get_request(self.path + 'batch', params)
+        assert response.status == HTTPStatus.OK
+        assert response.body['results'] == [film.dict() for film in films]
+
+        # Повторный запрос отдается из кэша
+        await bulk(index=FILM_INDEX, objects=films, op_type='delete')
+        response = await make_get_request(self.path + 'batch', params)
+        assert response.body['results'] == [film.dict() for film in films]
+
     @pytest.mark.asyncio
     async def test_cache_update_film(self, bulk, make_get_request, cache):
         film = FilmDetailFactory(title='original title',
@@ -148,6 +223,41 @@ class TestFilmsAPI:
         response = await make_get_request(path)
         assert response.body == film.dict()
 
+    @pytest.mark.asyncio
+    async def test_cache_invalidate_film(self, bulk, make_get_request,
+                                         cache):
+        genre_one = GenreFactory()
+        genre_two = GenreFactory()
+        film = FilmDetailFactory(genre=[genre_one])
+        await bulk(index=FILM_INDEX, objects=[film])
+        path = self.path + film.id
+        params = {**self.params, 'filter[genre]': genre_two.id}
+
+        response = await make_get_request(self.path, params=params)
+        assert response.body['results'] == []
+        response = await make_get_request(path)
+        assert response.body == film.dict()
+
+        film.title = 'updated title'
+        film.genre = [genre_two]
+        await bulk(index=FILM_INDEX, objects=[film])
+        response = await make_get_request(self.path, params=params)
+        assert response.body['results'] == []
+
+        # ETL сообщает об измененном документе и новой ревизии индекса:
+        # сбрасываются и запись самого документа, и списки,
+        # в которые он теперь попадает
+        revision = await cache.incr(f'revision:{FILM_INDEX}')
+        await cache.publish(config.CACHE_INVALIDATION_CHANNEL, orjson.dumps(
+            {'index': FILM_INDEX, 'ids': [film.id], 'created': [],
+             'revision': revision}))
+        await asyncio.sleep(0.5)
+
+        response = await make_get_request(self.path, params=params)
+        assert [item['id'] for item in response.body['results']] == [film.id]
+        response = await make_get_request(path)
+        assert response.body == film.dict()
+
     @pytest.mark.asyncio
     async def test_cache_delete_film(self, bulk, make_get_request, cache):
         film = FilmDetailFactory(name='original title',
@@ -233,6 +343,161 @@ class TestFilmsAPI:
 
         assert details == 'Invalid page'
 
+    @pytest.mark.asyncio
+    async def test_films_page_after(self, make_get_request, bulk):
+        films = FilmFactory.build_batch(25)
+        await bulk(index=FILM_INDEX, objects=films)
+        params = {'sort': '-imdb_rating', 'page[size]': 10, 'page[after]': ''}
+
+        results = []
+        while params:
+            response = await make_get_request(self.path, params=params)
+            assert response.body['previous'] is None
+            results += response.body['results']
+            # Следующая страница - по курсору из ссылки next
+            next_page = response.body['next']
+            params = next_page and dict(parse_qsl(urlparse(next_page).query))
+
+        assert len({film['id'] for film in results}) == len(films)
+        ratings = [film['imdb_rating'] for film in results]
+        assert ratings == sorted(ratings, reverse=True)
+
+    @pytest.mark.asyncio
+    async def test_films_page_after_snapshot(self, make_get_request, bulk):
+        films = FilmFactory.build_batch(20)
+        await bulk(index=FILM_INDEX, objects=films)
+        params = {'sort': 'imdb_rating', 'page[size]': 10, 'page[after]': ''}
+        response = await make_get_request(self.path, params=params)
+        assert response.headers['Cache-Control'] == 'no-store'
+        results = response.body['results']
+
+        # Фильмы, загруженные во время обхода, в него не попадают
+        await bulk(index=FILM_INDEX, objects=FilmFactory.build_batch(10))
+        next_page = response.body['next']
+        params = dict(parse_qsl(urlparse(next_page).query))
+        response = await make_get_request(self.path, params=params)
+        results += response.body['results']
+
+        assert ({film['id'] for film in results} ==
+                {film.id for film in films})
+
+    @pytest.mark.asyncio
+    async def test_films_count(self, bulk, make_get_request, session):
+        films = FilmFactory.build_batch(15)
+        await bulk(index=FILM_INDEX, objects=films)
+
+        response = await make_get_request(self.path, params=self.params)
+        assert response.body['count'] == len(films)
+        assert response.body['count_relation'] == 'eq'
+
+        # HEAD отдает только число документов
+        url = build_url(config.SERVICE_URL, self.path)
+        async with session.head(url, params=self.params) as response:
+            assert response.status == HTTPStatus.OK
+            assert response.headers['X-Total-Count'] == str(len(films))
+            assert response.headers['X-Total-Pages'] == '2'
+
+    @pytest.mark.asyncio
+    async def test_films_count_invalidate(self, bulk, session, cache):
+        genre_one = GenreFactory()
+        genre_two = GenreFactory()
+        films = FilmDetailFactory.build_batch(5, genre=[genre_one])
+        await bulk(index=FILM_INDEX, objects=films)
+        url = build_url(config.SERVICE_URL, self.path)
+        params = {**self.params, 'filter[genre]': genre_one.id}
+
+        async with session.head(url, params=params) as response:
+            assert response.headers['X-Total-Count'] == '5'
+
+        # Документ изменен и больше не проходит отбор
+        films[0].genre = [genre_two]
+        await bulk(index=FILM_INDEX, objects=films[:1])
+        revision = await cache.incr(f'revision:{FILM_INDEX}')
+        await cache.publish(config.CACHE_INVALIDATION_CHANNEL, orjson.dumps(
+            {'index': FILM_INDEX, 'ids': [films[0].id], 'created': [],
+             'revision': revision}))
+        await asyncio.sleep(0.5)
+
+        async with session.head(url, params=params) as response:
+            assert response.headers['X-Total-Count'] == '4'
+        async with session.get(url, params=params) as response:
+            assert (await response.json())['count'] == 4
+
+    @pytest.mark.asyncio
+    async def test_films_count_proxy(self, bulk, session):
+        genre = GenreFactory()
+        films = FilmDetailFactory.build_batch(15, genre=[genre])
+        await bulk(index=FILM_INDEX, objects=films)
+        url = build_url(config.NGINX_URL, self.path)
+        params = {**self.params, 'filter[genre]': genre.id}
+
+        # Кэш nginx не отдает на HEAD ответ на GET и наоборот
+        async with session.get(url, params=params) as response:
+            assert (await response.json())['count'] == len(films)
+        async with session.head(url, params=params) as response:
+            assert response.status == HTTPStatus.OK
+            assert response.headers['X-Total-Count'] == str(len(films))
+            assert response.headers['X-Total-Pages'] == '2'
+        async with session.get(url, params=params) as response:
+            assert response.status == HTTPStatus.OK
+            assert (await response.json())['count'] == len(films)
+
+    @pytest.mark.asyncio
+    async def test_films_source_fields(self, bulk, make_get_request, cache):
+        films = FilmDetailFactory.build_batch(5)
+        await bulk(index=FILM_INDEX, objects=films)
+        response = await make_get_request(self.path, params=self.params)
+        assert len(response.body['results']) == len(films)
+
+        # В кэше результата поиска только поля модели ответа списка
+        entries = [orjson.loads(decode_cache(await cache.get(key=key)))
+                   for key in await cache.keys(f'{FILM_INDEX}:*')]
+        sources = [hit['_source'] for entry in entries
+                   if isinstance(entry, dict) and 'hits' in entry
+                   for hit in entry['hits']['hits']]
+        assert len(sources) == len(films)
+        for source in sources:
+            assert set(source) == {'id', 'title', 'imdb_rating'}
+
+    @pytest.mark.asyncio
+    async def test_film_fields(self, bulk, make_get_request):
+        film = FilmDetailFactory()
+        await bulk(index=FILM_INDEX, objects=[film])
+        path = self.path + film.id
+        params = {'fields[films]': 'title,imdb_rating,genre.name'}
+
+        response = await make_get_request(path, params=params)
+        assert response.body == {
+            'id': film.id,
+            'title': film.title,
+            'imdb_rating': film.imdb_rating,
+            'genre': [{'name': genre['name']}
+                      for genre in film.dict()['genre']],
+        }
+
+        # Проекция не подменяет полный документ в кэше
+        response = await make_get_request(path)
+        assert response.body == film.dict()
+
+        params = {'fields[films]': 'title,genre.unknown'}
+        response = await make_get_request(path, params=params)
+        assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    @pytest.mark.asyncio
+    async def test_films_fields(self, bulk, make_get_request):
+        films = FilmDetailFactory.build_batch(3)
+        await bulk(index=FILM_INDEX, objects=films)
+        params = {**self.params, 'fields[films]': 'title,description'}
+        response = await make_get_request(self.path, params=params)
+        for item in response.body['results']:
+            assert set(item) == {'id', 'title', 'description'}
+
+    @pytest.mark.asyncio
+    async def test_films_page_after_invalid(self, make_get_request):
+        params = {**self.params, 'page[after]': 'not-a-cursor'}
+        response = await make_get_request(self.path, params=params)
+        assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+
     @pytest.mark.asyncio
     async def test_films_filter_single_genre(self, make_get_request, bulk):
         genre_one = GenreFactory()
@@ -291,3 +556,29 @@ class TestFilmsAPI:
         params['filter[genre]'] = fake_genre_id
         response = await make_get_request(self.path, params=params)
         assert len(response.body['results']) == 0
+
+    @pytest.mark.asyncio
+    async def test_films_filter_genres_and_rating(self, make_get_request,
+                                                  bulk):
+        genre_one = GenreFactory()
+        genre_two = GenreFactory()
+        high = (FilmDetailFactory.build_batch(
+                    3, genre=[genre_one], imdb_rating=8.0)
+                + FilmDetailFactory.build_batch(
+                    2, genre=[genre_two], imdb_rating=9.0))
+        low = FilmDetailFactory.build_batch(
+            4, genre=[genre_one, genre_two], imdb_rating=3.0)
+        await bulk(index=FILM_INDEX,
+                   objects=high + low + FilmDetailFactory.build_batch(5))
+        # Фильтры объединяются: любой из жанров и рейтинг не ниже 7
+        params = {**self.params,
+                  'filter[genre]': f'{genre_two.id},{genre_one.id}',
+                  'filter[imdb_rating][gte]': 7}
+        response = await make_get_request(self.path, params=params)
+        assert response.status == HTTPStatus.OK
+        assert (sorted(film['id'] for film in response.body['results'])
+                == sorted(film.id for film in high))
+
+        params['filter[imdb_rating][gte]'] = 11
+        response = await make_get_request(self.path, params=params)
+        assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -4,11 +4,14 @@ from http import HTTPStatus
 import pytest
 
 from functional.settings import config
+from functional.testdata.films.factories import FilmDetailFactory
+from functional.testdata.films.schema import SCHEMA as films_schema
 from functional.testdata.genres.factory import GenreFactory, GenreDetailFactory
 from functional.testdata.genres.schema import SCHEMA as genres_schema
 
 
 GENRE_INDEX = config.ELASTIC_INDEX['genres']
+FILM_INDEX = config.ELASTIC_INDEX['films']
 
 
 @pytest.fixture(scope='class')
@@ -18,7 +21,14 @@ async def genres_index(es_client):
     await es_client.indices.delete(index=GENRE_INDEX)
 
 
-@pytest.mark.usefixtures('genres_index')
+@pytest.fixture(scope='class')
+async def films_index(es_client):
+    await es_client.indices.create(index=FILM_INDEX, body=films_schema)
+    yield
+    await es_client.indices.delete(index=FILM_INDEX)
+
+
+@pytest.mark.usefixtures('genres_index', 'films_index')
 class TestGenreAPI:
 
     path = 'api/v1/genres/'
@@ -32,6 +42,8 @@ class TestGenreAPI:
         query = {"query": {"match_all": {}}}
         await es_client.delete_by_query(index=GENRE_INDEX, body=query,
                                         refresh=True)
+        await es_client.delete_by_query(index=FILM_INDEX, body=query,
+                                        refresh=True)
 
     @pytest.fixture(autouse=True)
     async def clear_cache(self, cache):
@@ -124,6 +136,25 @@ class TestGenreAPI:
         assert fake_id != genre.id
         assert response.status == HTTPStatus.NOT_FOUND
 
+    @pytest.mark.asyncio
+    async def test_genre_films(self, bulk, make_get_request):
+        genre = GenreDetailFactory()
+        films = FilmDetailFactory.build_batch(
+            5, genre=[GenreFactory(id=genre.id, name=genre.name)])
+        await bulk(index=GENRE_INDEX, objects=[genre])
+        await bulk(index=FILM_INDEX,
+                   objects=films + FilmDetailFactory.build_batch(5))
+
+        response = await make_get_request(f'{self.path}{genre.id}/films/')
+        assert response.status == HTTPStatus.OK
+        assert response.body['count'] == len(films)
+        assert (sorted(film['id'] for film in response.body['results'])
+                == sorted(film.id for film in films))
+
+        response = await make_get_request(
+            f'{self.path}{uuid.uuid4()}/films/')
+        assert response.status == HTTPStatus.NOT_FOUND
+
     @pytest.mark.asyncio
     async def test_cache_update_genre(self, bulk, make_get_request, cache):
         genre = GenreDetailFactory(name='original',
@@ -1,4 +1,5 @@
 import math
+import uuid
 
 import orjson
 import pytest
@@ -11,7 +12,7 @@ from functional.testdata.persons.factories import (PersonDetailsFactory,
 from functional.testdata.persons.models import (PersonDetailsModel,
                                                 PersonPagination)
 from functional.testdata.persons.schema import SCHEMA as persons_schema
-from functional.utils.utils import hash_key
+from functional.utils.utils import decode_cache
 
 PERSON_INDEX = config.ELASTIC_INDEX['persons']
 FILM_INDEX = config.ELASTIC_INDEX['films']
@@ -183,15 +184,18 @@ class TestPersonsAPI:
         response = await make_get_request(path)
         data = response.body
 
-        key = hash_key(PERSON_INDEX, person.id)
-        data_cache = await cache.get(key=key)
+        # Ключи кэша включают поколение индекса и версию схемы,
+        # поэтому ищем записи индекса по префиксу
+        keys = await cache.keys(f'{PERSON_INDEX}:*')
+        data_cache = [orjson.loads(decode_cache(await cache.get(key=key)))
+                      for key in keys]
 
-        assert await cache.get(key=key) is not None, \
+        assert keys, \
             'Проверьте, что при запросе из кэша возвращаете данные объекта.'
-        assert orjson.loads(data_cache) == data, \
+        assert data in data_cache, \
             'Данные обекта в elastic не совпадают с данными в кэше'
-        await cache.delete(key=key)
-        assert await cache.get(key=key) is None, \
+        await cache.delete(*keys)
+        assert not await cache.keys(f'{PERSON_INDEX}:*'), \
             'Проверьте, что при DELETE удаляете объект из кэша'
 
     @pytest.mark.asyncio
@@ -261,3 +265,13 @@ class TestPersonsAPI:
 
         assert data['results'] == films, \
             'Данные не совпадают'
+
+    @pytest.mark.asyncio
+    async def test_09_person_films_not_found(self, make_get_request, bulk):
+        films = FilmFactory.build_batch(3)
+        await bulk(index=FILM_INDEX, objects=films)
+
+        path = f"{self.path}{uuid.uuid4()}/films/"
+        response = await make_get_request(path)
+        assert response.status == 404, \
+            'Проверьте, что для несуществующего человека возвращается 404'
@@ -2,9 +2,11 @@ import factory
 import pytest
 from faker import Factory as FakerFactory
 from functional.settings import config
-from functional.testdata.films.factories import FilmFactory
+from functional.testdata.films.factories import (FilmDetailFactory,
+                                                 FilmFactory)
 from functional.testdata.films.models import FilmPagination
 from functional.testdata.films.schema import SCHEMA as films_schema
+from functional.testdata.genres.factory import GenreFactory
 from functional.testdata.persons.factories import PersonFactory
 from functional.testdata.persons.models import PersonPagination
 from functional.testdata.persons.schema import SCHEMA as persons_schema
@@ -255,3 +257,62 @@ class TestSearchAPI:
         print(response.body)
         assert len(response.body['results']) == 0, \
             'Проверьте, что данные очищаются из кэша.'
+
+    @pytest.mark.asyncio
+    async def test_07_suggest(self, make_get_request, bulk):
+        films = FilmFactory.build_batch(3, title=factory.LazyAttribute(
+            lambda x: 'Uniquetitle ' + fake.name()))
+        await bulk(index=FILM_INDEX,
+                   objects=films + FilmFactory.build_batch(5))
+        persons = PersonFactory.build_batch(
+            2, full_name=factory.LazyAttribute(
+                lambda x: 'Uniquename ' + fake.name()))
+        await bulk(index=PERSON_INDEX, objects=persons)
+
+        path = '/api/v1/search/suggest'
+        response = await make_get_request(path, {'query': ' UNIQUE'})
+        data = response.body
+        assert response.status == 200
+        assert (sorted(film['title'] for film in data['films'])
+                == sorted(film.title for film in films)), \
+            'Подсказки должны совпадать с началом названия'
+        assert (sorted(person['id'] for person in data['persons'])
+                == sorted(person.id for person in persons))
+
+        response = await make_get_request(
+            path, {'query': 'uniquet', 'size': 1})
+        assert len(response.body['films']) == 1
+        assert response.body['persons'] == []
+
+    @pytest.mark.asyncio
+    async def test_08_films_search_phases(self, make_get_request, bulk):
+        films = FilmFactory.build_batch(4, title=factory.LazyAttribute(
+            lambda x: 'Uniquetitle ' + fake.name()))
+        await bulk(index=FILM_INDEX,
+                   objects=films + FilmFactory.build_batch(10))
+
+        path = '/api/v1/films/search'
+        # Начало слова находит точный запрос по началу фразы
+        response = await make_get_request(path, {'query': 'Uniquetit'})
+        assert response.body['count'] == len(films)
+
+        # Опечатку находит только запасной нечеткий запрос
+        response = await make_get_request(path, {'query': 'Uniqetitle'})
+        assert response.body['count'] == len(films)
+
+    @pytest.mark.asyncio
+    async def test_09_films_search_filter(self, make_get_request, bulk):
+        genre = GenreFactory()
+        films = FilmDetailFactory.build_batch(
+            3, genre=[genre], title=factory.LazyAttribute(
+                lambda x: 'Uniquetitle ' + fake.name()))
+        others = FilmDetailFactory.build_batch(
+            3, title=factory.LazyAttribute(
+                lambda x: 'Uniquetitle ' + fake.name()))
+        await bulk(index=FILM_INDEX, objects=films + others)
+
+        # Фильтр по жанру не теряется при полнотекстовом поиске
+        response = await make_get_request(
+            '/api/v1/films/search',
+            {'query': 'Uniquetitle', 'filter[genre]': genre.id})
+        assert response.body['count'] == len(films)
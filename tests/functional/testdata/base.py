@@ -20,6 +20,7 @@ class OrjsonMixin(BaseModel):
 class PaginationMixin(BaseModel):
     """Модель ответа API с пагинацией"""
     count: int
+    count_relation: str = 'eq'
     total_pages: int
     next: Optional[str] = None
     previous: Optional[str] = None
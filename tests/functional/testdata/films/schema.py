@@ -34,6 +34,10 @@ SCHEMA = {
                 'fields': {
                     'raw': {
                         'type': 'keyword'
+                    },
+                    'suggest': {
+                        'type': 'completion',
+                        'analyzer': 'simple'
                     }
                 }
             },
@@ -1,7 +1,14 @@
-from hashlib import sha256
+import lzma
+import struct
+import zlib
 from urllib.parse import urlparse, urlunparse
-from typing import Union
-import orjson
+
+# Форматы записей кэша API по первому байту
+CACHE_DECODERS = {
+    0: lambda data: data,
+    1: zlib.decompress,
+    2: lzma.decompress,
+}
 
 
 def build_url(base_url: str, *url_parts):
@@ -12,8 +19,13 @@ def build_url(base_url: str, *url_parts):
     return urlunparse(url_parts)
 
 
-def hash_key(index: str, key: Union[str, dict]) -> str:
-    # Формирует хеш ключа запроса
-    key: bytes = orjson.dumps(key)
-    hash = sha256(key).hexdigest()
-    return f'{index}:{hash}'
+def decode_cache(data: bytes) -> bytes:
+    decoder = CACHE_DECODERS.get(data[0]) if data else None
+    data = decoder(data[1:]) if decoder else data
+    # Готовый ответ API хранится вместе со сжатыми вариантами,
+    # первым идет несжатый
+    if data.startswith(b'RV1'):
+        name_size, size = struct.unpack_from('>BI', data, 3)
+        offset = 3 + struct.calcsize('>BI') + name_size
+        data = data[offset:offset + size]
+    return data
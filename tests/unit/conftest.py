@@ -0,0 +1,170 @@
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import orjson
+import pytest
+from elasticsearch import NotFoundError
+
+# Код API: каталог src репозитория или рабочий каталог образа
+SRC_PATH = Path(__file__).resolve().parents[2] / 'src'
+sys.path.insert(0, str(SRC_PATH) if SRC_PATH.is_dir() else os.getcwd())
+
+from db import cache as cache_module  # noqa: E402
+from db import storage as storage_module  # noqa: E402
+
+
+class DictCache:
+    """Основной кэш в памяти теста вместо Redis"""
+
+    def __init__(self):
+        # Ключ - данные и оставшийся срок жизни
+        self.data: dict = {}
+        self.tags: defaultdict = defaultdict(set)
+        self.locks: set = set()
+        # Сессии обхода и их снимки
+        self.sessions: dict = {}
+        self.revisions: dict = {}
+
+    async def set(self, key, data, expire=None, tags=()):
+        if isinstance(data, str):
+            data = data.encode()
+        self.data[key] = (data, expire)
+        for tag in tags:
+            self.tags[tag].add(key)
+
+    async def get(self, key):
+        return self.data.get(key, (None, None))[0]
+
+    async def get_many(self, keys):
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, items):
+        for key, data, tags, expire in items:
+            await self.set(key, data, expire, tags)
+
+    async def get_with_ttl(self, key):
+        return self.data.get(key, (None, None))
+
+    async def get_key(self, prefix, query, version=''):
+        query = orjson.dumps(query, option=orjson.OPT_SORT_KEYS).decode()
+        return f'{prefix}:0:{version}:{query}'
+
+    async def get_generation(self, index):
+        return 0
+
+    def set_generation(self, index, generation):
+        pass
+
+    async def get_revision(self, index):
+        return self.revisions.get(index, 0)
+
+    def set_revision(self, index, revision):
+        self.revisions[index] = revision
+
+    async def lock(self, name, expire):
+        if name in self.locks:
+            return False
+        self.locks.add(name)
+        return True
+
+    async def get_popular(self, index, limit):
+        return []
+
+    async def reserve_pit(self, session, expire, limit):
+        if limit and len(self.sessions) >= limit:
+            return False
+        self.sessions[session] = None
+        return True
+
+    async def set_pit(self, session, pit_id, expire):
+        self.sessions[session] = pit_id
+
+    async def get_pit(self, session, expire):
+        return self.sessions.get(session)
+
+    async def delete_pit(self, session):
+        self.sessions.pop(session, None)
+
+    async def invalidate_tags(self, tags):
+        count = 0
+        for tag in tags:
+            for key in self.tags.pop(tag, ()):
+                count += self.data.pop(key, None) is not None
+        return count
+
+    def reset(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeStorage:
+    """Хранилище теста: запоминает запросы, может задержать ответ"""
+
+    def __init__(self):
+        self.docs: dict = {}
+        self.calls: list = []
+        # Пока событие не установлено, запросы ждут
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.error = None
+
+    async def call(self, name, *args):
+        self.calls.append((name, *args))
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+
+    async def get(self, index, id, **params):
+        await self.call('get', index, id)
+        if id not in self.docs:
+            raise NotFoundError(404, 'not_found')
+        return {'_id': id, '_source': self.docs[id]}
+
+    async def mget(self, index, ids):
+        await self.call('mget', index, ids)
+        return {'docs': [
+            {'_id': id, 'found': True, '_source': self.docs[id]}
+            if id in self.docs else {'_id': id, 'found': False}
+            for id in ids]}
+
+    async def search(self, **query):
+        await self.call('search', query)
+        hits = [{'_id': id, '_source': doc, 'sort': [id]}
+                for id, doc in sorted(self.docs.items())]
+        return {'hits': {'total': {'value': len(hits), 'relation': 'eq'},
+                         'hits': hits[:query.get('size', 10)]}}
+
+    async def count(self, index, body):
+        await self.call('count', index)
+        return {'count': len(self.docs)}
+
+    async def open_pit(self, index, keep_alive):
+        await self.call('open_pit', index)
+        return f'pit-{len(self.calls)}'
+
+    async def close_pit(self, pit_id):
+        await self.call('close_pit', pit_id)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def cache():
+    cache = DictCache()
+    cache_module.cache = cache
+    yield cache
+    cache_module.cache = None
+
+
+@pytest.fixture
+def storage():
+    storage = FakeStorage()
+    storage_module.db = storage
+    yield storage
+    storage_module.db = None
@@ -0,0 +1,40 @@
+import orjson
+import pytest
+from db.codec import CODECS, HEADERS, decode, encode, get_codec
+
+DATA = orjson.dumps({'id': '1', 'title': 'film ' * 500})
+
+
+@pytest.mark.parametrize('name', sorted(CODECS))
+def test_roundtrip(name):
+    data = encode(DATA, codec=name, threshold=0)
+    assert data[0] == CODECS[name].header[0]
+    assert decode(data) == DATA
+
+
+def test_headers_unique():
+    assert len(HEADERS) == len(CODECS)
+    # Записи без заголовка начинаются с первого байта JSON
+    assert not set(HEADERS) & set(b'{["ntf-0123456789')
+
+
+def test_small_not_compressed():
+    data = encode(b'{}', codec='zlib', threshold=1024)
+    assert data == CODECS['raw'].header + b'{}'
+    assert decode(data) == b'{}'
+
+
+def test_incompressible_kept_raw():
+    data = bytes(range(256))
+    assert encode(data, codec='zlib', threshold=0)[0] == 0
+    assert decode(encode(data, codec='zlib', threshold=0)) == data
+
+
+def test_legacy_entry_read_as_is():
+    assert decode(DATA) == DATA
+    assert decode(None) is None
+    assert decode(b'') == b''
+
+
+def test_unavailable_codec_falls_back():
+    assert get_codec('unknown') is CODECS['zlib']
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from db.elastic import SEARCH_FILTER_PATH, SearchBatcher, to_msearch
+from elasticsearch import NotFoundError, TransportError
+
+
+class MsearchClient:
+    """Клиент elastic: на каждый поиск отвечает его телом"""
+
+    def __init__(self):
+        self.requests = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.error = None
+
+    async def msearch(self, body, filter_path=None):
+        self.requests.append(body)
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return {'responses': [
+            search['response'] for search in body[1::2]]}
+
+
+def search(batcher, response):
+    return asyncio.ensure_future(
+        batcher.search({'index': 'movies'}, {'response': response}))
+
+
+@pytest.mark.asyncio
+async def test_responses_demultiplexed():
+    client = MsearchClient()
+    batcher = SearchBatcher(client, window=0.01, max_size=10)
+    responses = [{'hits': {'total': {'value': i}}} for i in range(3)]
+    results = await asyncio.gather(
+        *(search(batcher, response) for response in responses))
+
+    assert results == responses
+    assert len(client.requests) == 1
+    assert len(client.requests[0]) == 6
+
+
+@pytest.mark.asyncio
+async def test_error_isolated():
+    client = MsearchClient()
+    batcher = SearchBatcher(client, window=0.01, max_size=10)
+    missing = {'status': 404, 'error': {'type': 'index_not_found'}}
+    results = await asyncio.gather(
+        search(batcher, {'hits': 1}), search(batcher, missing),
+        search(batcher, {'hits': 3}), return_exceptions=True)
+
+    assert results[0] == {'hits': 1} and results[2] == {'hits': 3}
+    assert isinstance(results[1], NotFoundError)
+    assert results[1].error == 'index_not_found'
+
+
+@pytest.mark.asyncio
+async def test_request_error_shared():
+    client = MsearchClient()
+    client.error = TransportError(500, 'boom')
+    batcher = SearchBatcher(client, window=0.01, max_size=10)
+    results = await asyncio.gather(
+        search(batcher, {}), search(batcher, {}), return_exceptions=True)
+
+    assert results == [client.error, client.error]
+
+
+@pytest.mark.asyncio
+async def test_short_response_fails():
+    client = MsearchClient()
+    batcher = SearchBatcher(client, window=0.01, max_size=10)
+
+    async def msearch(body, filter_path=None):
+        return {'responses': [{'hits': 1}]}
+    client.msearch = msearch
+    results = await asyncio.gather(
+        search(batcher, {}), search(batcher, {}), return_exceptions=True)
+
+    assert all(isinstance(result, TransportError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_max_size_flushes():
+    client = MsearchClient()
+    batcher = SearchBatcher(client, window=60, max_size=2)
+    results = await asyncio.wait_for(asyncio.gather(
+        search(batcher, {'hits': 1}), search(batcher, {'hits': 2})),
+        timeout=1)
+
+    assert results == [{'hits': 1}, {'hits': 2}]
+    assert batcher.timer is None
+
+
+@pytest.mark.asyncio
+async def test_cancelled_send_releases_callers():
+    client = MsearchClient()
+    client.gate.clear()
+    batcher = SearchBatcher(client, window=60, max_size=10)
+    tasks = [search(batcher, {}), search(batcher, {})]
+    await asyncio.sleep(0)
+    batcher.flush()
+    await asyncio.sleep(0)
+    for task in batcher.sending:
+        task.cancel()
+    done, pending = await asyncio.wait(tasks, timeout=1)
+
+    assert not pending
+    assert all(task.cancelled() for task in done)
+
+
+def test_pit_search_not_batched():
+    query = {'index': 'movies', 'filter_path': SEARCH_FILTER_PATH,
+             'body': {'pit': {'id': 'pit'}}}
+    assert to_msearch(query) is None
+    query = {'index': 'movies', 'filter_path': SEARCH_FILTER_PATH,
+             'body': {}, 'sort': 'imdb_rating:desc,id', 'size': 10}
+    assert to_msearch(query) == ({'index': 'movies'}, {
+        'sort': [{'imdb_rating': 'desc'}, 'id'], 'size': 10})
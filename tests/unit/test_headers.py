@@ -0,0 +1,24 @@
+from core import config
+from core.fastapi_viewset.utils import get_cache_headers
+from db.policy import CachePolicy
+
+
+def test_client_max_age_capped(monkeypatch):
+    monkeypatch.setattr(config, 'CACHE_CLIENT_MAX_AGE', 5)
+    policy = CachePolicy('movies', ttl=300, stale=600)
+    headers = get_cache_headers(policy, '"etag"', 300)
+
+    assert headers['Cache-Control'] == (
+        'public, max-age=5, stale-while-revalidate=5')
+    assert headers['ETag'] == '"etag"'
+    # Запись, которой осталось жить меньше, хранится меньше
+    headers = get_cache_headers(CachePolicy('movies', ttl=300), '"e"', 2)
+    assert headers['Cache-Control'] == 'public, max-age=2'
+
+
+def test_no_cache(monkeypatch):
+    monkeypatch.setattr(config, 'CACHE_CLIENT_MAX_AGE', 0)
+    policy = CachePolicy('movies', ttl=300, stale=600)
+
+    assert get_cache_headers(policy, '"etag"', 300)['Cache-Control'] == (
+        'no-cache')
@@ -0,0 +1,56 @@
+import asyncio
+
+import orjson
+import pytest
+from db import invalidation
+from db.tags import doc_tag
+
+
+class Channel:
+    """Канал подписки: отдает сообщения и закрывается, если closed"""
+
+    def __init__(self, messages, closed):
+        self.messages = [orjson.dumps(message) for message in messages]
+        self.closed = closed
+
+    async def wait_message(self):
+        if self.messages:
+            return True
+        if not self.closed:
+            await asyncio.Event().wait()
+        return False
+
+    async def get(self):
+        return self.messages.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_resubscribe_after_channel_closed(cache, monkeypatch):
+    resync = []
+    await cache.set('movies:1', b'1', tags=[doc_tag('movies', '1')])
+    await cache.set('movies:2', b'2', tags=[doc_tag('movies', '2')])
+    channels = [
+        Channel([{'index': 'movies', 'ids': ['1']}], closed=True),
+        Channel([{'index': 'movies', 'ids': ['2']}], closed=False),
+    ]
+    subscribed = []
+
+    async def subscribe(name):
+        subscribed.append(name)
+        return channels[len(subscribed) - 1]
+
+    async def record(cache):
+        resync.append(cache)
+
+    monkeypatch.setattr(cache, 'subscribe', subscribe, raising=False)
+    monkeypatch.setattr(invalidation, 'resync', record)
+    task = asyncio.create_task(invalidation.listen(cache, 'invalidate'))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    task.cancel()
+    # Сообщения нового канала обрабатываются, а пропущенные за время
+    # разрыва изменения учитываются сбросом состояния процесса
+    assert subscribed == ['invalidate', 'invalidate']
+    assert resync == [cache]
+    assert await cache.get('movies:1') is None
+    assert await cache.get('movies:2') is None
@@ -0,0 +1,231 @@
+import asyncio
+
+import orjson
+import pytest
+from db.manager import DataManager
+from db.policy import CachePolicy, policies
+from db.tags import doc_tag
+from services.films import Films
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    DataManager.inflight.clear()
+    yield
+    DataManager.inflight.clear()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once(cache, storage):
+    storage.docs['1'] = {'id': '1', 'title': 'film'}
+    storage.gate.clear()
+    tasks = [asyncio.ensure_future(Films.get('1')) for _ in range(10)]
+    await asyncio.sleep(0)
+    storage.gate.set()
+    results = await asyncio.gather(*tasks)
+
+    assert results == [storage.docs['1']] * 10
+    assert storage.calls == [('get', Films.index, '1')]
+    assert not DataManager.inflight
+    # Следующий запрос получает документ из кэша
+    assert await Films.get('1') == storage.docs['1']
+    assert len(storage.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_error(cache, storage):
+    storage.gate.clear()
+    storage.error = ConnectionError('elastic is down')
+    tasks = [asyncio.ensure_future(Films.get('1')) for _ in range(10)]
+    await asyncio.sleep(0)
+    storage.gate.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(result is storage.error for result in results)
+    assert len(storage.calls) == 1
+    assert not cache.data
+    # После ошибки следующий промах снова идет в хранилище
+    storage.error = None
+    storage.docs['1'] = {'id': '1'}
+    assert await Films.get('1') == {'id': '1'}
+    assert len(storage.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_keeps_load(cache, storage):
+    storage.docs['1'] = {'id': '1'}
+    storage.gate.clear()
+    first = asyncio.ensure_future(Films.get('1'))
+    second = asyncio.ensure_future(Films.get('1'))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    storage.gate.set()
+
+    assert await second == {'id': '1'}
+    assert len(storage.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_is_cached(cache, storage):
+    assert await Films.get('1') is None
+    assert await Films.get('1') is None
+
+    assert len(storage.calls) == 1
+    key = await Films.get_key('1')
+    assert cache.data[key][0] == orjson.dumps(None)
+
+
+@pytest.fixture
+def stale_policy():
+    policies[(Films.index, 'detail')] = CachePolicy(
+        Films.index, ttl=30, stale=300, jitter=0)
+    yield
+    policies.pop((Films.index, 'detail'))
+
+
+@pytest.mark.asyncio
+async def test_stale_hit_refreshes_once(cache, storage, stale_policy):
+    key = await Films.get_key('1')
+    # Свежий срок истек: осталось меньше stale секунд
+    await cache.set(key, orjson.dumps({'id': '1', 'title': 'old'}), 100)
+    storage.docs['1'] = {'id': '1', 'title': 'new'}
+    storage.gate.clear()
+    results = await asyncio.gather(*[Films.get('1') for _ in range(10)])
+
+    assert results == [{'id': '1', 'title': 'old'}] * 10
+    assert len(DataManager.inflight) == 1
+    storage.gate.set()
+    await asyncio.gather(*DataManager.inflight.values())
+
+    assert storage.calls == [('get', Films.index, '1')]
+    assert cache.data[key] == (orjson.dumps(storage.docs['1']), 330)
+    assert await Films.get('1') == {'id': '1', 'title': 'new'}
+
+
+@pytest.mark.asyncio
+async def test_fresh_hit_not_refreshed(cache, storage, stale_policy):
+    key = await Films.get_key('1')
+    await cache.set(key, orjson.dumps({'id': '1'}), 301)
+
+    assert await Films.get('1') == {'id': '1'}
+    assert not DataManager.inflight
+    assert not storage.calls
+
+
+@pytest.mark.asyncio
+async def test_stale_missing_not_refreshed(cache, storage, stale_policy):
+    key = await Films.get_key('1')
+    await cache.set(key, orjson.dumps(None), 5)
+
+    assert await Films.get('1') is None
+    assert not DataManager.inflight
+    assert not storage.calls
+
+
+@pytest.mark.asyncio
+async def test_get_many_writes_once(cache, storage, monkeypatch):
+    storage.docs['1'] = {'id': '1'}
+    writes = []
+
+    async def set_many(items):
+        writes.append(list(items))
+    monkeypatch.setattr(cache, 'set_many', set_many)
+
+    assert await Films.get_many(['1', '2']) == [{'id': '1'}, None]
+    assert storage.calls == [('mget', Films.index, ['1', '2'])]
+    items, = writes
+    policy = Films.get_policy('detail')
+    (_, found, _, found_ttl), (_, missing, _, missing_ttl) = items
+    assert found == orjson.dumps({'id': '1'})
+    assert missing == orjson.dumps(None)
+    assert policy.ttl + policy.stale <= found_ttl
+    assert policy.negative <= missing_ttl < found_ttl
+
+
+@pytest.mark.asyncio
+async def test_search_tags_dropped_with_owner(cache, storage):
+    storage.docs['1'] = {'id': '1'}
+    owner = doc_tag('persons', 'p1')
+    query = {'index': Films.index, 'size': 10,
+             'body': {'query': {'terms': {'id': {'id': 'p1'}}}}}
+    docs = await Films.search(kind='relation', tags=[owner], **query)
+
+    assert [hit['_id'] for hit in docs['hits']['hits']] == ['1']
+    key = await Films.get_key(query, query['index'])
+    count_key = await Films.get_count_key(query)
+    assert cache.tags[owner] == {key, count_key}
+
+    await cache.invalidate_tags([owner])
+    assert key not in cache.data and count_key not in cache.data
+    await Films.search(kind='relation', tags=[owner], **query)
+    assert len(storage.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_follows_index_revision(cache, storage):
+    # Поиск не помечается тегами документов: изменения индекса
+    # меняют его ревизию, и записи прошлой ревизии не читаются
+    storage.docs['1'] = {'id': '1'}
+    query = {'index': Films.index, 'size': 10,
+             'body': {'query': {'match_all': {}}}}
+    await Films.search(**query)
+    await Films.search(**query)
+    assert len(storage.calls) == 1
+    assert not cache.tags
+
+    cache.set_revision(Films.index, 1)
+    await Films.search(**query)
+    assert len(storage.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_count_reads_exact_total(cache, storage):
+    # HEAD берет точное число, посчитанное поиском, без _count
+    storage.docs.update({'1': {'id': '1'}, '2': {'id': '2'}})
+    query = {'index': Films.index, 'size': 10,
+             'body': {'query': {'match_all': {}}}}
+    await Films.search(**query)
+    assert await Films.get_count(query) == 2
+    assert [call[0] for call in storage.calls] == ['search']
+
+
+@pytest.mark.asyncio
+async def test_count_refines_lower_bound(cache, storage):
+    storage.docs.update({'1': {'id': '1'}, '2': {'id': '2'}})
+    query = {'index': Films.index, 'size': 10,
+             'body': {'query': {'match_all': {}}}}
+    await cache.set(await Films.get_count_key(query),
+                    orjson.dumps({'value': 1, 'relation': 'gte'}))
+    assert await Films.get_count(query) == 2
+    assert await Films.get_count(query) == 2
+    assert [call[0] for call in storage.calls] == ['count']
+
+
+@pytest.mark.asyncio
+async def test_exact_phase_without_count(cache, storage):
+    # Точный поиск сам дает число документов, _count не нужен
+    storage.docs['1'] = {'id': '1'}
+    query = {'index': Films.index, 'size': 10,
+             'body': {'query': {'match_phrase_prefix': {'title': 'fi'}}},
+             'fallback': {'query': {'match': {'title': 'fi'}},
+                          'threshold': 1}}
+    chosen, docs = await Films.choose_phase(query, 'search')
+
+    assert chosen['body'] == query['body'] and 'fallback' not in chosen
+    assert [hit['_id'] for hit in docs['hits']['hits']] == ['1']
+    assert [call[0] for call in storage.calls] == ['search']
+
+
+@pytest.mark.asyncio
+async def test_fallback_phase_same_for_all_pages(cache, storage):
+    fuzzy = {'match': {'title': 'fi'}}
+    query = {'index': Films.index, 'size': 10,
+             'body': {'query': {'match_phrase_prefix': {'title': 'fi'}}},
+             'fallback': {'query': fuzzy, 'threshold': 1}}
+    for from_ in (0, 10):
+        chosen, docs = await Films.choose_phase(
+            {**query, 'from_': from_}, 'search')
+        assert chosen['body']['query'] == fuzzy and docs is None
+    # Следующая страница берет число документов точного запроса из кэша
+    assert [call[0] for call in storage.calls] == ['search']
@@ -0,0 +1,67 @@
+import pytest
+from db.memory import LRUSegment, MemoryCache
+
+
+def test_segment_evicts_by_count():
+    segment = LRUSegment(max_items=2, max_bytes=1024)
+    segment.set('movies:a', b'a', ttl=60)
+    segment.set('movies:b', b'b', ttl=60)
+    # Последнее обращение делает запись самой свежей
+    assert segment.get('movies:a')[0] == b'a'
+    segment.set('movies:c', b'c', ttl=60)
+
+    assert segment.get('movies:b') == (None, None)
+    assert segment.get('movies:a')[0] == b'a'
+    assert segment.get('movies:c')[0] == b'c'
+    assert len(segment.items) == 2
+
+
+def test_segment_evicts_by_bytes():
+    segment = LRUSegment(max_items=100, max_bytes=10)
+    segment.set('movies:a', b'aaaa', ttl=60)
+    segment.set('movies:b', b'bbbb', ttl=60)
+    segment.set('movies:c', b'cccc', ttl=60)
+
+    assert segment.get('movies:a') == (None, None)
+    assert segment.get('movies:b')[0] == b'bbbb'
+    assert segment.get('movies:c')[0] == b'cccc'
+    assert segment.size == 8
+
+
+def test_segment_skips_oversized():
+    segment = LRUSegment(max_items=100, max_bytes=10)
+    segment.set('movies:a', b'aaaa', ttl=60)
+    segment.set('movies:b', b'b' * 11, ttl=60)
+
+    assert segment.get('movies:b') == (None, None)
+    assert segment.get('movies:a')[0] == b'aaaa'
+    assert segment.size == 4
+
+
+def test_segment_replaces_size():
+    segment = LRUSegment(max_items=100, max_bytes=10)
+    segment.set('movies:a', b'aaaa', ttl=60)
+    segment.set('movies:a', b'aa', ttl=60)
+
+    assert segment.size == 2
+
+
+def test_segment_expires():
+    segment = LRUSegment(max_items=100, max_bytes=1024)
+    segment.set('movies:a', b'a', ttl=-1)
+
+    assert segment.get('movies:a') == (None, None)
+    assert segment.size == 0
+
+
+@pytest.mark.asyncio
+async def test_capacity_per_prefix(cache):
+    local = MemoryCache(cache, ttl=60, max_items=1, max_bytes=1024,
+                        capacity={'movies': {'items': 2, 'bytes': 1024}})
+    for key in ('movies:a', 'movies:b', 'genres:a', 'genres:b'):
+        await local.set(key, key)
+
+    assert list(local.segments['movies'].items) == ['movies:a', 'movies:b']
+    assert list(local.segments['genres'].items) == ['genres:b']
+    # Вытесненная из памяти запись читается из основного кэша
+    assert await local.get('genres:a') == b'genres:a'
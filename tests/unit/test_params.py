@@ -0,0 +1,25 @@
+from core import config
+from core.fastapi_viewset.utils import canonical_params
+
+
+def test_text_and_lists_normalized():
+    assert canonical_params([
+        ('query', '  Star   WARS '),
+        ('filter[genre]', 'b, a,,c'),
+    ]) == [('filter[genre]', 'a,b,c'), ('query', 'star wars')]
+
+
+def test_defaults_dropped():
+    assert canonical_params([
+        ('page[number]', '01'),
+        ('page[size]', str(config.PAGE_SIZE)),
+        ('sort', '-imdb_rating'),
+    ]) == [('sort', '-imdb_rating')]
+    assert canonical_params([('page[number]', '2')]) == [
+        ('page[number]', '2')]
+
+
+def test_order_ignored():
+    params = [('sort', 'title'), ('filter[genre]', 'a'), ('page[after]', '')]
+    assert canonical_params(params) == canonical_params(params[::-1])
+    assert ('page[after]', '') in canonical_params(params)
@@ -0,0 +1,42 @@
+import pytest
+from core import config
+from db import pit
+from services.films import Films
+
+
+@pytest.fixture
+def max_sessions(monkeypatch):
+    monkeypatch.setattr(config, 'PIT_MAX_SESSIONS', 1)
+
+
+@pytest.mark.asyncio
+async def test_sessions_limited(cache, storage, max_sessions):
+    session, pit_id = await pit.open_session(Films.index)
+    assert await pit.open_session(Films.index) is None
+    assert [call[0] for call in storage.calls] == ['open_pit']
+
+    await pit.close_session(session, pit_id)
+    assert await pit.open_session(Films.index) is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_open_releases(cache, storage, max_sessions):
+    storage.error = ConnectionError('elastic is down')
+    with pytest.raises(ConnectionError):
+        await pit.open_session(Films.index)
+
+    assert not cache.sessions
+
+
+@pytest.mark.asyncio
+async def test_search_without_session(cache, storage, max_sessions):
+    storage.docs = {'1': {'id': '1'}, '2': {'id': '2'}}
+    cache.sessions['other'] = 'pit'
+    query = {'index': Films.index, 'body': {'query': {'match_all': {}}},
+             'sort': 'id:asc', 'size': 10}
+    docs = await Films.search_session(kind='list', session=None, **query)
+
+    assert not docs.get('session')
+    assert [hit['_id'] for hit in docs['hits']['hits']] == ['1', '2']
+    (name, search), = storage.calls
+    assert name == 'search' and 'pit' not in search['body']
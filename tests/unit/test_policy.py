@@ -0,0 +1,45 @@
+from time import monotonic
+
+import pytest
+from db.policy import CachePolicy, ChangeRate
+
+
+@pytest.mark.parametrize('seconds', [0, 1, 10, 300, 3600])
+def test_spread_bounds(seconds):
+    policy = CachePolicy('movies', ttl=30, jitter=0.1)
+    values = {policy.spread(seconds) for _ in range(1000)}
+
+    assert all(isinstance(value, int) for value in values)
+    assert min(values) >= seconds
+    assert max(values) <= seconds + round(seconds * 0.1)
+
+
+def test_spread_varies():
+    policy = CachePolicy('movies', ttl=30, jitter=0.1)
+    assert len({policy.spread(300) for _ in range(100)}) > 1
+
+
+def test_no_jitter():
+    policy = CachePolicy('movies', ttl=30, stale=60, jitter=0)
+    assert {policy.expire for _ in range(100)} == {90}
+
+
+def test_expire_bounds():
+    policy = CachePolicy('movies', ttl=30, stale=60, jitter=0.2)
+    values = [policy.expire for _ in range(1000)]
+    assert 90 <= min(values) and max(values) <= 108
+
+
+def test_adaptive_ttl_bounds(monkeypatch):
+    changes = ChangeRate()
+    monkeypatch.setattr('db.policy.changes', changes)
+    policy = CachePolicy('movies', ttl=30, max_ttl=600, jitter=0)
+    assert policy.ttl == 30
+
+    changes.intervals['movies'] = 10
+    changes.last['movies'] = monotonic()
+    assert policy.ttl == 30
+    changes.intervals['movies'] = 400
+    assert policy.ttl == 200
+    changes.intervals['movies'] = 10 ** 6
+    assert policy.ttl == 600
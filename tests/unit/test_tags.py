@@ -0,0 +1,15 @@
+from db.tags import changed_tags, doc_tag
+
+
+def test_updated_drop_doc_entries():
+    # Списки, поиски и число документов сбрасываются ревизией индекса
+    assert changed_tags('movies', ['1']) == {doc_tag('movies', '1')}
+
+
+def test_created_drop_doc_entries():
+    # Запомненное отсутствие созданного документа
+    assert changed_tags('movies', [], ['2']) == {doc_tag('movies', '2')}
+
+
+def test_nothing_changed():
+    assert changed_tags('movies', [], []) == set()
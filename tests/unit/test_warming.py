@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from api.v1 import warming
+from api.v1.films import FilmsViewSet
+from api.v1.genres import GenresViewSet
+from api.v1.utils.films import FilmSortEnum
+from core import config
+
+
+class Load:
+    """Число одновременных запросов прогрева к хранилищу"""
+    running = 0
+    max_running = 0
+
+
+class Queries:
+    """Запросы прогрева одного ресурса"""
+
+    def __init__(self, count, load):
+        self.count = count
+        self.load = load
+        self.params = []
+
+    async def __call__(self, params, kind='list', schema=None):
+        self.load.running += 1
+        self.load.max_running = max(self.load.max_running,
+                                    self.load.running)
+        self.params.append(params)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        self.load.running -= 1
+        return {'hits': {'total': {'value': self.count},
+                         'hits': [{'_source': {'id': 'genre'}}]}}
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    load = Load()
+    films = Queries(count=10 * config.PAGE_SIZE, load=load)
+    genres = Queries(count=1, load=load)
+    monkeypatch.setattr(FilmsViewSet, 'get_query', films)
+    monkeypatch.setattr(GenresViewSet, 'get_query', genres)
+    monkeypatch.setattr(config, 'CACHE_WARM_CONCURRENCY', 2)
+    monkeypatch.setattr(config, 'CACHE_WARM_PAGES', 3)
+    return films, genres
+
+
+@pytest.mark.asyncio
+async def test_concurrency_bound(cache, queries):
+    films, genres = queries
+    await warming.warm(cache)
+
+    assert len(genres.params) == 1
+    # Все сортировки без фильтра и с единственным жанром, по 3 страницы
+    assert len(films.params) == len(FilmSortEnum) * 2 * 3
+    assert {params['page[number]'] for params in films.params
+            if 'page[number]' in params} == {2, 3}
+    assert films.load.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_lock_skips_second_run(cache, queries):
+    films, _ = queries
+    await warming.warm(cache)
+    calls = len(films.params)
+    await warming.warm(cache)
+
+    assert 'warming' in cache.locks
+    assert len(films.params) == calls
+
+
+@pytest.mark.asyncio
+async def test_start_once(cache, queries):
+    films, _ = queries
+    warming.start(cache)
+    task = warming.task
+    warming.start(cache)
+
+    assert warming.task is task
+    await task
+    warming.task = None